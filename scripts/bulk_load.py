@@ -0,0 +1,174 @@
+"""
+SOEN363 Phase 2 - Bulk-Load Mode
+Drop the keys, unique constraints, foreign keys and secondary indexes of the
+generated tables before a load, then rebuild them once the data is in
+
+Rows loaded into bare tables skip every index update and foreign key probe.
+The rebuild builds each index in a single sorted pass, with independent
+builds running side by side on separate connections. Foreign keys are
+re-added NOT VALID and then validated, one set-based check per constraint.
+ANALYZE runs at the end. The dropped definitions are kept in
+sql/checkpoint.json until the rebuild finishes, so an interrupted bulk load
+can still restore them.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import psycopg2
+
+from checkpoint import clear_checkpoints, read_checkpoints, save_checkpoint
+
+BULK_STAGE = "bulk_load_schema"
+
+# Memory for each index build's sort
+MAINTENANCE_WORK_MEM = "256MB"
+
+CONSTRAINTS_SQL = """
+    SELECT c.conname, c.conrelid::regclass::text, c.contype, pg_get_constraintdef(c.oid),
+           c.conindid::regclass::text, pg_get_indexdef(c.conindid)
+    FROM pg_constraint c
+    WHERE c.contype IN ('p', 'u', 'f')
+      AND (c.conrelid::regclass::text = ANY(%s) OR c.confrelid::regclass::text = ANY(%s))
+    ORDER BY c.conrelid::regclass::text, c.conname
+"""
+
+# Indexes that don't back a constraint
+INDEXES_SQL = """
+    SELECT i.indexrelid::regclass::text, i.indrelid::regclass::text, pg_get_indexdef(i.indexrelid)
+    FROM pg_index i
+    WHERE i.indrelid::regclass::text = ANY(%s)
+      AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = i.indexrelid)
+    ORDER BY i.indexrelid::regclass::text
+"""
+
+def saved_schema_objects():
+    """Return the definitions dropped by an unfinished bulk load, or None"""
+    state = read_checkpoints().get(BULK_STAGE)
+    return state["objects"] if state else None
+
+def read_schema_objects(conn, tables):
+    """Return the keys, unique constraints, foreign keys and plain indexes touching tables"""
+    cursor = conn.cursor()
+    cursor.execute(CONSTRAINTS_SQL, (tables, tables))
+    constraints = [
+        {"name": name, "table": table, "type": contype, "definition": definition,
+         "index_name": index_name, "index": index}
+        for name, table, contype, definition, index_name, index in cursor.fetchall()
+    ]
+    cursor.execute(INDEXES_SQL, (tables,))
+    indexes = [{"name": name, "table": table, "definition": definition} for name, table, definition in cursor.fetchall()]
+    cursor.close()
+    return {"constraints": constraints, "indexes": indexes}
+
+def drop_schema_objects(conn, tables):
+    """Drop every key, foreign key and secondary index on tables, returning their definitions
+
+    The definitions are checkpointed before anything is dropped. If a
+    previous bulk load was interrupted, its saved definitions are reused,
+    since the catalog no longer has them.
+    """
+    objects = saved_schema_objects()
+    if objects is None:
+        objects = read_schema_objects(conn, tables)
+        save_checkpoint(BULK_STAGE, {"settings": {"tables": tables}, "objects": objects})
+    else:
+        print("[BULK] Reusing constraint definitions saved by an interrupted bulk load")
+
+    foreign_keys = [c for c in objects["constraints"] if c["type"] == "f"]
+    keys = [c for c in objects["constraints"] if c["type"] != "f"]
+
+    # Foreign keys go first: they depend on the unique indexes they reference
+    cursor = conn.cursor()
+    for constraint in foreign_keys + keys:
+        cursor.execute(f'ALTER TABLE {constraint["table"]} DROP CONSTRAINT IF EXISTS {constraint["name"]}')
+    for index in objects["indexes"]:
+        cursor.execute(f'DROP INDEX IF EXISTS {index["name"]}')
+    conn.commit()
+    cursor.close()
+
+    print(f"✓ Dropped {len(keys)} key(s), {len(foreign_keys)} foreign key(s) "
+          f"and {len(objects['indexes'])} index(es)")
+    return objects
+
+def run_tasks(config, tasks, workers):
+    """Run lists of statements side by side, each list in order on one autocommit connection"""
+    local = threading.local()
+    connections = []
+
+    def run(statements):
+        if getattr(local, "conn", None) is None:
+            local.conn = psycopg2.connect(**config)
+            local.conn.autocommit = True
+            connections.append(local.conn)
+            with local.conn.cursor() as cursor:
+                cursor.execute("SET maintenance_work_mem = %s", (MAINTENANCE_WORK_MEM,))
+        with local.conn.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for future in [pool.submit(run, statements) for statements in tasks]:
+                future.result()
+    finally:
+        for conn in connections:
+            conn.close()
+
+def existing_names(conn, tables):
+    """Return the constraint and index names currently defined on tables"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT conname FROM pg_constraint WHERE conrelid::regclass::text = ANY(%s)", (tables,))
+    names = {row[0] for row in cursor.fetchall()}
+    cursor.execute("SELECT indexrelid::regclass::text FROM pg_index WHERE indrelid::regclass::text = ANY(%s)",
+                   (tables,))
+    names.update(row[0] for row in cursor.fetchall())
+    conn.commit()
+    cursor.close()
+    return names
+
+def group_by_table(items, statement):
+    """Return one task per table holding statement(item) for each of its items"""
+    tasks = {}
+    for item in items:
+        tasks.setdefault(item["table"], []).append(statement(item))
+    return list(tasks.values())
+
+def rebuild_schema_objects(conn, config, objects, tables, workers):
+    """Rebuild what drop_schema_objects removed, returning [(phase, seconds)]
+
+    Objects that already exist (from a rebuild that was interrupted) are
+    skipped, so the rebuild can simply be run again.
+    """
+    existing = existing_names(conn, tables + [c["table"] for c in objects["constraints"]])
+    keys = [c for c in objects["constraints"] if c["type"] != "f" and c["name"] not in existing]
+    foreign_keys = [c for c in objects["constraints"] if c["type"] == "f"]
+    missing_foreign_keys = [c for c in foreign_keys if c["name"] not in existing]
+    indexes = [i for i in objects["indexes"] if i["name"] not in existing]
+
+    phases = [
+        # Index builds on one table only take SHARE locks, so every index builds at once
+        ("indexes", [[key["index"]] for key in keys if key["index_name"] not in existing] +
+                    [[index["definition"]] for index in indexes]),
+        ("keys", group_by_table(keys, lambda c: (
+            f'ALTER TABLE {c["table"]} ADD CONSTRAINT {c["name"]} '
+            f'{"PRIMARY KEY" if c["type"] == "p" else "UNIQUE"} USING INDEX {c["index_name"]}'))),
+        ("foreign keys", group_by_table(missing_foreign_keys, lambda c: (
+            f'ALTER TABLE {c["table"]} ADD CONSTRAINT {c["name"]} {c["definition"]} NOT VALID'))),
+        # VALIDATE takes a self-conflicting lock, so constraints of one table run in turn
+        ("validate", group_by_table(foreign_keys, lambda c: (
+            f'ALTER TABLE {c["table"]} VALIDATE CONSTRAINT {c["name"]}'))),
+        ("analyze", [[f"ANALYZE {table}"] for table in tables]),
+    ]
+
+    timings = []
+    for phase, tasks in phases:
+        print(f"[BULK] Rebuilding {phase} ({sum(len(t) for t in tasks)} statement(s))...")
+        start = time.perf_counter()
+        run_tasks(config, tasks, workers)
+        timings.append((phase, time.perf_counter() - start))
+        print(f"  ✓ {phase} done in {timings[-1][1]:.2f} seconds")
+
+    clear_checkpoints([BULK_STAGE])
+    return timings
@@ -0,0 +1,65 @@
+"""
+SOEN363 Phase 2 - Resumable Stage Checkpoints
+Record how far each conversion or load stage got, so an interrupted run can
+continue with --resume instead of starting over
+
+All stages share one JSON file, keyed by stage name. A stage's state is only
+reused when it was written with the same settings (format, batch sizes and
+the size/mtime of its inputs).
+"""
+
+import json
+import os
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHECKPOINT_FILE = os.path.join(PROJECT_ROOT, "sql", "checkpoint.json")
+
+def read_checkpoints(checkpoint_file=CHECKPOINT_FILE):
+    """Return {stage: state} for every checkpointed stage"""
+    if not os.path.exists(checkpoint_file):
+        return {}
+    with open(checkpoint_file, 'r') as f:
+        return json.load(f)
+
+def write_checkpoints(checkpoints, checkpoint_file=CHECKPOINT_FILE):
+    """Replace the checkpoint file atomically, so a crash never leaves it torn"""
+    os.makedirs(os.path.dirname(checkpoint_file), exist_ok=True)
+    tmp_file = checkpoint_file + ".tmp"
+    with open(tmp_file, 'w') as f:
+        json.dump(checkpoints, f, indent=2)
+    os.replace(tmp_file, checkpoint_file)
+
+def load_checkpoint(stage, settings, checkpoint_file=CHECKPOINT_FILE):
+    """Return the saved state of a stage, or None if it has no checkpoint
+
+    Raises ValueError if the checkpoint was written with different settings.
+    """
+    state = read_checkpoints(checkpoint_file).get(stage)
+    if state is None:
+        return None
+    if state["settings"] != settings:
+        raise ValueError(f"Checkpoint for {stage} was written with different settings or inputs; "
+                         f"rerun without --resume")
+    return state
+
+def save_checkpoint(stage, state, checkpoint_file=CHECKPOINT_FILE):
+    """Replace the saved state of one stage"""
+    checkpoints = read_checkpoints(checkpoint_file)
+    checkpoints[stage] = state
+    write_checkpoints(checkpoints, checkpoint_file)
+
+def clear_checkpoints(stages, checkpoint_file=CHECKPOINT_FILE):
+    """Forget the given stages, so a fresh run is not mistaken for resumable work"""
+    checkpoints = read_checkpoints(checkpoint_file)
+    if any(stage in checkpoints for stage in stages):
+        for stage in stages:
+            checkpoints.pop(stage, None)
+        write_checkpoints(checkpoints, checkpoint_file)
+
+def input_signature(paths):
+    """Identify input files by path, size and modification time"""
+    return [
+        {"path": os.path.abspath(path), "size": os.path.getsize(path), "mtime": int(os.path.getmtime(path))}
+        for path in paths
+    ]
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+SOEN363 Phase 2 - Document Build Microbenchmark (recursive conversion vs per-column converters)
+
+This script fetches rows of each table load_to_mongodb_fast.py reads and times
+turning them into MongoDB-compatible dicts two ways:
+- recursive: map the row to {column: value}, then check the type of every
+             value of the finished dict (the old convert_to_mongo_compatible)
+- typed:     RowConverter, with a converter picked once per column from
+             cursor.description and applied while the dict is built
+Both must produce the same dicts; the rows are fetched before timing, so only
+the Python work per row is measured.
+
+USAGE:
+    python scripts/document_build_benchmark.py
+    python scripts/document_build_benchmark.py --rows 50000 --repeat 7
+
+Results are appended to:
+    reports/performance_test_results/performance_test_document_build.csv
+"""
+
+import argparse
+import csv
+import os
+import sys
+import time
+from datetime import date, datetime
+from decimal import Decimal
+
+from load_to_mongodb_fast import PATIENT_STREAMS, PROJECT_ROOT, RowConverter, connect_postgres
+
+
+# ================================
+# CONFIG
+# ================================
+OUTPUT_CSV = os.path.join(PROJECT_ROOT, "reports", "performance_test_results",
+                          "performance_test_document_build.csv")
+
+FIELDNAMES = ["timestamp", "table", "rows", "columns", "converted_columns", "recursive_us_per_row",
+              "typed_us_per_row", "speedup"]
+
+# Queries and the columns left out of each table's documents, as in load_to_mongodb_fast.py
+CHILD_COLUMNS = {'admission_subject_id', 'row_id', 'subject_id', 'hadm_id'}
+TABLES = [
+    ("patients", PATIENT_STREAMS["patients"][0].format(where=""), {'row_id'}),
+    ("admissions", PATIENT_STREAMS["admissions"][0].format(where=""), {'row_id', 'subject_id'}),
+    ("icustays", PATIENT_STREAMS["icustays"][0].format(where=""), CHILD_COLUMNS),
+    ("diagnoses_icd", PATIENT_STREAMS["diagnoses_icd"][0].format(where=""), CHILD_COLUMNS),
+    ("noteevents", "SELECT * FROM noteevents ORDER BY subject_id", {'row_id'}),
+]
+
+def convert_recursive(obj):
+    """The type-checking conversion the per-column converters replaced"""
+    if isinstance(obj, Decimal):
+        return float(obj)
+    elif isinstance(obj, date):
+        return obj.isoformat()
+    elif isinstance(obj, dict):
+        return {k: convert_recursive(v) for k, v in obj.items()}
+    elif isinstance(obj, list):
+        return [convert_recursive(v) for v in obj]
+    return obj
+
+def fetch_rows(conn, query, rows):
+    """Return (rows, cursor.description) for the first rows of query"""
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT * FROM ({query}) q LIMIT %s", (rows,))
+    fetched = cursor.fetchall()
+    description = cursor.description
+    cursor.close()
+    conn.commit()
+    return fetched, description
+
+def best_time(build, rows, repeat):
+    """Fastest of repeat passes of build over rows, in seconds"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for row in rows:
+            build(row)
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best
+
+def run_table(conn, table, query, skip, rows, repeat):
+    fetched, description = fetch_rows(conn, query, rows)
+    if not fetched:
+        print(f"  ⚠ {table}: no rows, skipped")
+        return None
+
+    col_idx = {desc[0]: i for i, desc in enumerate(description)}
+    typed = RowConverter(description, skip)
+
+    def recursive(row):
+        return convert_recursive({col: row[idx] for col, idx in col_idx.items() if col not in skip})
+
+    for row in fetched:
+        if typed(row) != recursive(row):
+            print(f"  ✗ {table}: the two builds differ on {row!r:.200}")
+            sys.exit(1)
+
+    recursive_seconds = best_time(recursive, fetched, repeat)
+    typed_seconds = best_time(typed, fetched, repeat)
+    recursive_us = recursive_seconds / len(fetched) * 1e6
+    typed_us = typed_seconds / len(fetched) * 1e6
+    print(f"  ✓ {table}: {len(fetched):,} rows, recursive {recursive_us:.2f} µs/row, "
+          f"typed {typed_us:.2f} µs/row ({recursive_seconds / typed_seconds:.2f}x)")
+
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "table": table,
+        "rows": len(fetched),
+        "columns": len(typed.names),
+        "converted_columns": len(typed.converters),
+        "recursive_us_per_row": round(recursive_us, 3),
+        "typed_us_per_row": round(typed_us, 3),
+        "speedup": round(recursive_seconds / typed_seconds, 2),
+    }
+
+# ================================
+# CSV writer
+# ================================
+def write_csv(path, rows):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    file_exists = os.path.isfile(path)
+    with open(path, "a", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
+        if not file_exists:
+            writer.writeheader()
+        writer.writerows(rows)
+    print(f"\n[DONE] Results saved to: {path}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Time building MongoDB documents with recursive conversion "
+                                                 "vs per-column converters")
+    parser.add_argument("--rows", type=int, default=20000, help="Rows fetched per table (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="Timed passes per method; the fastest is kept (default: %(default)s)")
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("SOEN363 PHASE 2 - DOCUMENT BUILD MICROBENCHMARK")
+    print("=" * 70)
+
+    conn = connect_postgres()
+    print(f"\n[BENCH] {args.rows:,} rows per table, best of {max(args.repeat, 1)} passes...")
+    results = []
+    try:
+        for table, query, skip in TABLES:
+            result = run_table(conn, table, query, skip, args.rows, max(args.repeat, 1))
+            if result:
+                results.append(result)
+    finally:
+        conn.close()
+
+    if results:
+        write_csv(OUTPUT_CSV, results)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+SOEN363 Phase 2 - Hospital Schema Definitions
+Table columns read from database/init/01-schema.sql, shared by the converter and loaders
+"""
+
+import glob
+import os
+import re
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCHEMA_FILE = os.path.join(PROJECT_ROOT, "database", "init", "01-schema.sql")
+
+# Directory holding the per-table COPY payloads for the scaled dataset
+COPY_DIR = os.path.join(PROJECT_ROOT, "sql", "copy_scaled")
+
+# Tables produced from the scaled JSON, in foreign key order
+LOAD_ORDER = ["patients", "admissions", "icustays", "diagnoses_icd", "noteevents"]
+PATIENT_TABLES = ["patients", "admissions", "icustays", "diagnoses_icd"]
+
+CREATE_TABLE_RE = re.compile(r'CREATE TABLE (\w+) \((.*?)\n\);', re.DOTALL)
+REFERENCES_RE = re.compile(r'REFERENCES (\w+)')
+COLUMN_RE = re.compile(r'^(\w+)\s+(\w+(?:\s*\([^)]*\))?)')
+TABLE_CONSTRAINTS = ("FOREIGN", "PRIMARY", "UNIQUE", "CONSTRAINT", "CHECK")
+
+def load_table_columns(schema_file=SCHEMA_FILE):
+    """Return {table: [(column, type), ...]} in declaration order"""
+    with open(schema_file, 'r') as f:
+        schema_sql = f.read()
+
+    tables = {}
+    for table, body in CREATE_TABLE_RE.findall(schema_sql):
+        columns = []
+        for line in body.split('\n'):
+            line = line.strip().rstrip(',')
+            if not line or line.upper().startswith(TABLE_CONSTRAINTS):
+                continue
+            match = COLUMN_RE.match(line)
+            if match:
+                columns.append((match.group(1), match.group(2).upper()))
+        tables[table] = columns
+    return tables
+
+TABLE_COLUMNS = load_table_columns()
+
+def load_table_references(schema_file=SCHEMA_FILE):
+    """Return {table: [referenced table, ...]} from the foreign keys in the schema"""
+    with open(schema_file, 'r') as f:
+        schema_sql = f.read()
+
+    references = {}
+    for table, body in CREATE_TABLE_RE.findall(schema_sql):
+        references[table] = sorted(set(REFERENCES_RE.findall(body)) - {table})
+    return references
+
+TABLE_REFERENCES = load_table_references()
+
+def table_dependencies(table):
+    """Return the generated tables that must be loaded before a table, per its foreign keys
+
+    Reference tables loaded by 02-load-data.sql (e.g. d_icd_diagnoses) are
+    already in place and are not counted.
+    """
+    return [ref for ref in TABLE_REFERENCES[table] if ref in LOAD_ORDER]
+
+def column_names(table):
+    """Return the column names of a table in declaration order"""
+    return [column for column, _ in TABLE_COLUMNS[table]]
+
+def copy_file_path(table, output_dir=COPY_DIR, binary=False, compressed=False):
+    """Return the path of the text (.tsv) or binary (.bin) COPY payload for a table"""
+    path = os.path.join(output_dir, f"{table}.bin" if binary else f"{table}.tsv")
+    return path + ".gz" if compressed else path
+
+def split_output_path(path):
+    """Split an output path into its root and extension, keeping .gz with the extension"""
+    root, ext = os.path.splitext(path)
+    if ext == ".gz":
+        root, inner_ext = os.path.splitext(root)
+        ext = inner_ext + ext
+    return root, ext
+
+def shard_file_path(path, shard_index):
+    """Return the path of one shard's part of an output file"""
+    root, ext = split_output_path(path)
+    return f"{root}.part{shard_index:05d}{ext}"
+
+def shard_file_paths(path):
+    """Return the shard parts written for an output file, in order"""
+    root, ext = split_output_path(path)
+    return sorted(glob.glob(f"{glob.escape(root)}.part[0-9][0-9][0-9][0-9][0-9]{ext}"))
@@ -0,0 +1,203 @@
+"""
+SOEN363 Phase 2 - MongoDB Insert Pipeline
+Overlap building documents with inserting them: the building thread puts
+batches on a bounded queue and several insert threads drain it, sharing one
+pooled MongoClient
+
+When the inserters fall behind the queue fills up and put() blocks, so the
+builder can never run more than QUEUE_BATCHES batches ahead (back-pressure).
+close() waits for the queue to drain and prints how busy each stage was, to
+show which side is the bottleneck.
+
+AdaptiveBatcher cuts the BSON-encoded documents into batches by size rather
+than count, and resizes its byte budget so an insert_many takes about
+TARGET_INSERT_SECONDS at the insert rate the server is actually achieving.
+"""
+
+import queue
+import threading
+import time
+
+# insert_many calls in flight at once
+INSERT_THREADS = 4
+
+# Batches the builder may get ahead of the inserters
+QUEUE_BATCHES = 8
+
+# BSON bytes per insert_many: starting budget and the range it may be tuned within,
+# far below the 48 MB message limit
+INITIAL_BATCH_BYTES = 1024 * 1024
+MIN_BATCH_BYTES = 128 * 1024
+MAX_BATCH_BYTES = 16 * 1024 * 1024
+
+# insert_many duration the byte budget is tuned towards
+TARGET_INSERT_SECONDS = 0.2
+
+# Weight of the latest insert when updating the budget
+BUDGET_SMOOTHING = 0.3
+
+class InsertPipeline:
+    """Bounded queue between the thread building batches and the threads inserting them
+
+    Use as a context manager around the build loop: put() each batch of
+    documents, and leaving the block waits for every batch to be inserted.
+    An insert error stops the pipeline and is raised from the next put()
+    or from close().
+    """
+
+    def __init__(self, collection, telemetry=None, threads=INSERT_THREADS, queue_batches=QUEUE_BATCHES,
+                 on_insert=None):
+        self.collection = collection
+        self.telemetry = telemetry
+        # Called with (bytes, seconds) after each insert, e.g. AdaptiveBatcher.observe
+        self.on_insert = on_insert
+        self.queue = queue.Queue(maxsize=queue_batches)
+        self.threads = [threading.Thread(target=self.insert_loop, daemon=True) for _ in range(max(threads, 1))]
+        self.lock = threading.Lock()
+        self.error = None
+        self.inserted = 0
+        self.insert_seconds = [0.0] * len(self.threads)
+        self.put_wait = 0.0
+        self.depths = []
+        self.start = None
+        self.build_end = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        for number, thread in enumerate(self.threads):
+            thread.name = f"inserter-{number}"
+            thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            # The build failed: let the inserters finish, keeping the original error
+            self.stop()
+
+    def insert_loop(self):
+        number = self.threads.index(threading.current_thread())
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            if self.error is not None:
+                continue
+            docs, nbytes = item
+            start = time.perf_counter()
+            try:
+                if self.telemetry is not None:
+                    with self.telemetry.batch(len(docs), nbytes):
+                        self.collection.insert_many(docs, ordered=False)
+                else:
+                    self.collection.insert_many(docs, ordered=False)
+            except Exception as e:
+                with self.lock:
+                    self.error = self.error or e
+                continue
+            seconds = time.perf_counter() - start
+            self.insert_seconds[number] += seconds
+            if self.on_insert is not None:
+                self.on_insert(nbytes, seconds)
+            with self.lock:
+                self.inserted += len(docs)
+
+    def put(self, docs, nbytes=0):
+        """Queue a batch of nbytes for insertion, blocking while the queue is full"""
+        self.depths.append(self.queue.qsize())
+        start = time.perf_counter()
+        while True:
+            if self.error is not None:
+                raise self.error
+            try:
+                self.queue.put((docs, nbytes), timeout=0.1)
+                break
+            except queue.Full:
+                continue
+        self.put_wait += time.perf_counter() - start
+
+    def stop(self):
+        self.build_end = time.perf_counter()
+        for _ in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+
+    def close(self):
+        """Wait for every queued batch to be inserted, print the stage stats and return the documents inserted
+
+        Also called on leaving the with block; the count stays in inserted.
+        """
+        self.stop()
+        if self.error is not None:
+            raise self.error
+        self.print_stats()
+        return self.inserted
+
+    def print_stats(self):
+        wall = max(time.perf_counter() - self.start, 1e-9)
+        build = max(self.build_end - self.start, 1e-9)
+        busy = [seconds / wall for seconds in self.insert_seconds]
+        print(f"  [PIPELINE] builder {max(build - self.put_wait, 0) / build:.0%} busy "
+              f"({self.put_wait:.2f} s blocked on a full queue, {wall - build:.2f} s draining), "
+              f"{len(self.threads)} inserters {sum(busy) / len(busy):.0%} busy on average, "
+              f"queue depth avg {sum(self.depths) / max(len(self.depths), 1):.1f}/{self.queue.maxsize}")
+
+class AdaptiveBatcher:
+    """Cut RawBSONDocuments into batches of about budget bytes, tuning the budget from insert latency
+
+    add() returns (docs, bytes) whenever a batch is full. observe() takes
+    the bytes and seconds of each finished insert and moves the budget
+    towards what the server inserts in TARGET_INSERT_SECONDS. Budget changes
+    of more than a quarter are printed, and summary() reports the batch sizes used.
+    """
+
+    def __init__(self, label, budget=INITIAL_BATCH_BYTES):
+        self.label = label
+        self.budget = budget
+        self.logged_budget = budget
+        self.lock = threading.Lock()
+        self.docs = []
+        self.size = 0
+        self.batch_docs = []
+        self.batch_bytes = []
+
+    def add(self, doc):
+        self.docs.append(doc)
+        self.size += len(doc.raw)
+        if self.size >= self.budget:
+            return self.flush()
+        return None
+
+    def flush(self):
+        """Return the pending (docs, bytes), or None if nothing is pending"""
+        if not self.docs:
+            return None
+        batch = (self.docs, self.size)
+        self.batch_docs.append(len(self.docs))
+        self.batch_bytes.append(self.size)
+        self.docs = []
+        self.size = 0
+        return batch
+
+    def observe(self, nbytes, seconds):
+        if nbytes <= 0:
+            return
+        wanted = nbytes / max(seconds, 1e-6) * TARGET_INSERT_SECONDS
+        with self.lock:
+            budget = (1 - BUDGET_SMOOTHING) * self.budget + BUDGET_SMOOTHING * wanted
+            self.budget = int(min(max(budget, MIN_BATCH_BYTES), MAX_BATCH_BYTES))
+            if not 0.75 <= self.budget / self.logged_budget <= 1.25:
+                print(f"  [BATCH] {self.label}: budget {self.logged_budget / 1024:,.0f} KB -> "
+                      f"{self.budget / 1024:,.0f} KB ({nbytes / 1024 / 1024 / max(seconds, 1e-6):.1f} MB/s, "
+                      f"{seconds * 1000:.0f} ms per insert)")
+                self.logged_budget = self.budget
+
+    def summary(self):
+        if not self.batch_docs:
+            return
+        docs = sorted(self.batch_docs)
+        print(f"  [BATCH] {self.label}: {len(docs):,} batch(es) of {docs[0]:,}-{docs[-1]:,} documents "
+              f"(median {docs[len(docs) // 2]:,}), {sum(self.batch_bytes) / len(docs) / 1024:,.0f} KB on average, "
+              f"final budget {self.budget / 1024:,.0f} KB")
@@ -0,0 +1,109 @@
+"""
+SOEN363 Phase 2 - JSON Array Boundary Scanner
+Find the byte range of every element of a top-level JSON array in a memory-mapped
+file, so worker processes can parse their own slices of the scaled JSON files
+
+The scan only matches brackets and skips over strings; nothing is decoded.
+Workers map the same file and json.loads their slice, so no process holds a
+private copy of the whole file.
+"""
+
+import json
+import mmap
+import re
+
+# psql exports jsonb_agg results as {"jsonb_agg": [...]} or [{"jsonb_agg": [...]}]
+JSONB_AGG_RE = re.compile(rb'\s*(?:\[\s*)?\{\s*"jsonb_agg"\s*:\s*\[')
+ARRAY_START_RE = re.compile(rb'\s*\[')
+SEPARATOR_RE = re.compile(rb'[\s,]*')
+
+# Nesting handled by the single-regex fast path (the scaled patients nest 5 deep)
+MAX_NESTING = 8
+
+STRING = rb'"[^"\\]*+(?:\\.[^"\\]*+)*+"'
+PLAIN = rb'[^"{}\[\]]++'
+
+def build_element_re(max_nesting=MAX_NESTING):
+    """Return a regex matching one object or array nested at most max_nesting deep
+
+    Possessive quantifiers keep the match linear: a bracket inside a string is
+    consumed by the string branch and never counted.
+    """
+    body = rb'(?:' + PLAIN + rb'|' + STRING + rb')*+'
+    for _ in range(max_nesting):
+        body = rb'(?:' + PLAIN + rb'|' + STRING + rb'|\{' + body + rb'\}|\[' + body + rb'\])*+'
+    return re.compile(rb'\{' + body + rb'\}|\[' + body + rb'\]')
+
+ELEMENT_RE = build_element_re()
+SCALAR_RE = re.compile(STRING + rb'|[^\s,\]]++')
+TOKEN_RE = re.compile(STRING + rb'|[{}\[\]]')
+
+def scan_nested_end(buf, pos):
+    """Return the end of the object or array at pos by counting bracket depth
+
+    Slow path for elements nested deeper than ELEMENT_RE handles.
+    """
+    depth = 0
+    for token in TOKEN_RE.finditer(buf, pos):
+        char = buf[token.start()]
+        if char in b'{[':
+            depth += 1
+        elif char in b'}]':
+            depth -= 1
+            if depth == 0:
+                return token.end()
+    raise ValueError(f"Unterminated JSON element at byte {pos}")
+
+def element_end(buf, pos):
+    """Return the byte offset just past the array element starting at pos"""
+    match = ELEMENT_RE.match(buf, pos)
+    if match:
+        return match.end()
+    if buf[pos:pos + 1] in (b'{', b'['):
+        return scan_nested_end(buf, pos)
+    match = SCALAR_RE.match(buf, pos)
+    if match:
+        return match.end()
+    raise ValueError(f"Invalid JSON element at byte {pos}")
+
+def iter_element_ranges(buf):
+    """Yield (start, end) byte offsets of each element of the top-level array in buf"""
+    opening = JSONB_AGG_RE.match(buf) or ARRAY_START_RE.match(buf)
+    if opening is None:
+        raise ValueError("Input does not contain a JSON array")
+
+    pos = opening.end()
+    while True:
+        pos = SEPARATOR_RE.match(buf, pos).end()
+        if pos >= len(buf):
+            raise ValueError("Unexpected end of JSON array")
+        if buf[pos:pos + 1] == b']':
+            return
+        end = element_end(buf, pos)
+        yield pos, end
+        pos = end
+
+def map_file(json_file):
+    """Memory-map a file read-only"""
+    with open(json_file, 'rb') as f:
+        if f.seek(0, 2) == 0:
+            raise ValueError(f"{json_file} is empty")
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+def find_element_ranges(json_file):
+    """Return [(start, end)] for every element of the JSON array in json_file"""
+    with map_file(json_file) as buf:
+        return list(iter_element_ranges(buf))
+
+def group_ranges(ranges, group_size):
+    """Merge consecutive element ranges into (start, end, count) slices of group_size elements"""
+    groups = []
+    for i in range(0, len(ranges), group_size):
+        chunk = ranges[i:i + group_size]
+        groups.append((chunk[0][0], chunk[-1][1], len(chunk)))
+    return groups
+
+def load_slice(json_file, start, end):
+    """Parse the elements between two element boundaries of json_file"""
+    with map_file(json_file) as buf:
+        return json.loads(b'[' + buf[start:end] + b']')
@@ -3,12 +3,49 @@ SOEN363 Phase 2 - Convert JSON to PostgreSQL INSERT Statements
 Convert scaled JSON files to SQL INSERT statements for PostgreSQL
 """
 
+import argparse
+import gzip
+import io
 import json
 import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 
+from checkpoint import clear_checkpoints, input_signature, load_checkpoint, save_checkpoint
+from hospital_schema import (COPY_DIR, LOAD_ORDER, PATIENT_TABLES, column_names, copy_file_path,
+                             shard_file_path, shard_file_paths)
+from json_boundaries import find_element_ranges, group_ranges, load_slice
+from pgcopy_binary import PGCOPY_HEADER, PGCOPY_TRAILER, encode_row
+
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
+# Read size used when streaming the scaled JSON files
+JSON_CHUNK_SIZE = 1024 * 1024
+
+# Write buffer for the generated SQL files and how often progress is printed
+WRITE_BUFFER_SIZE = 8 * 1024 * 1024
+PROGRESS_INTERVAL = 100000
+
+# Patients handed to each worker process in parallel mode
+SHARD_SIZE = 5000
+
+# Rows packed into each multi-row INSERT ... VALUES statement
+ROWS_PER_INSERT = 100
+
+# gzip level for --gzip output; level 1 keeps compression from slowing the converter down
+GZIP_LEVEL = 1
+
+# Lines around the INSERT statements of each generated SQL file
+SQL_HEADER = ["BEGIN TRANSACTION;", "SET CONSTRAINTS ALL DEFERRED;", ""]
+SQL_FOOTER = ["", "COMMIT;"]
+
+# psql exports jsonb_agg results as {"jsonb_agg": [...]} or [{"jsonb_agg": [...]}]
+JSONB_AGG_RE = re.compile(r'\s*(?:\[\s*)?\{\s*"jsonb_agg"\s*:\s*\[')
+ARRAY_START_RE = re.compile(r'\s*\[')
+SEPARATOR_RE = re.compile(r'[\s,]*')
+
 # Load ICD9 code mapping
 CODE_MAPPING = {}
 mapping_file = os.path.join(PROJECT_ROOT, "icd9_code_mapping.json")
@@ -56,211 +93,750 @@ def load_json(json_file):
         print(f"✗ Error loading JSON: {e}")
         return []
 
-def generate_sql_inserts(patients_data, output_file):
-    """Generate SQL INSERT statements from patient data"""
-    print(f"\n[GENERATE] Creating SQL INSERT statements...")
-
-    patient_row_id = 1
-    admission_row_id = 1
-    icustay_row_id = 1
-    diagnoses_row_id = 1
-
-    inserts = []
-
-    # Start transactions
-    inserts.append("BEGIN TRANSACTION;")
-    inserts.append("SET CONSTRAINTS ALL DEFERRED;")
-    inserts.append("")
-
-    for patient in patients_data:
-        subject_id = patient.get("subject_id")
-        gender = escape_sql_string(patient.get("gender"))
-        dob = escape_sql_string(patient.get("dob"))
-        dod = escape_sql_string(patient.get("dod"))
-        dod_hosp = escape_sql_string(patient.get("dod_hosp"))
-        dod_ssn = escape_sql_string(patient.get("dod_ssn"))
-        expire_flag = patient.get("expire_flag", 0)
-
-        # Insert patient
-        insert_stmt = f"""INSERT INTO patients (row_id, subject_id, gender, dob, dod, dod_hosp, dod_ssn, expire_flag) VALUES ({patient_row_id}, {subject_id}, {gender}, {dob}, {dod}, {dod_hosp}, {dod_ssn}, {expire_flag});"""
-        inserts.append(insert_stmt)
-        patient_row_id += 1
-
-        # Insert admissions
-        for admission in patient.get("admissions", []):
-            hadm_id = admission.get("hadm_id")
-            admittime = escape_sql_string(admission.get("admittime"))
-            dischtime = escape_sql_string(admission.get("dischtime"))
-            deathtime = escape_sql_string(admission.get("deathtime"))
-            admission_type = escape_sql_string(admission.get("admission_type"))
-            admission_location = escape_sql_string(admission.get("admission_location"))
-            discharge_location = escape_sql_string(admission.get("discharge_location"))
-            insurance = escape_sql_string(admission.get("insurance"))
-            language = escape_sql_string(admission.get("language"))
-            religion = escape_sql_string(admission.get("religion"))
-            marital_status = escape_sql_string(admission.get("marital_status"))
-            ethnicity = escape_sql_string(admission.get("ethnicity"))
-            edregtime = escape_sql_string(admission.get("edregtime"))
-            edouttime = escape_sql_string(admission.get("edouttime"))
-            diagnosis = escape_sql_string(admission.get("diagnosis"))
-            hospital_expire_flag = admission.get("hospital_expire_flag", 0)
-            has_chartevents_data = admission.get("has_chartevents_data", 0)
-
-            insert_stmt = f"""INSERT INTO admissions (row_id, subject_id, hadm_id, admittime, dischtime, deathtime, admission_type, admission_location, discharge_location, insurance, language, religion, marital_status, ethnicity, edregtime, edouttime, diagnosis, hospital_expire_flag, has_chartevents_data) VALUES ({admission_row_id}, {subject_id}, {hadm_id}, {admittime}, {dischtime}, {deathtime}, {admission_type}, {admission_location}, {discharge_location}, {insurance}, {language}, {religion}, {marital_status}, {ethnicity}, {edregtime}, {edouttime}, {diagnosis}, {hospital_expire_flag}, {has_chartevents_data});"""
-            inserts.append(insert_stmt)
-            admission_row_id += 1
-
-            # Insert ICU stays
-            for icustay in admission.get("icustays", []):
-                icustay_id = icustay.get("icustay_id")
-                dbsource = escape_sql_string(icustay.get("dbsource"))
-                first_careunit = escape_sql_string(icustay.get("first_careunit"))
-                last_careunit = escape_sql_string(icustay.get("last_careunit"))
-                first_wardid = icustay.get("first_wardid")
-                if first_wardid is None:
-                    first_wardid = "NULL"
-                last_wardid = icustay.get("last_wardid")
-                if last_wardid is None:
-                    last_wardid = "NULL"
-                intime = escape_sql_string(icustay.get("intime"))
-                outtime = escape_sql_string(icustay.get("outtime"))
-                los = icustay.get("los")
-                if los is None:
-                    los = "NULL"
-
-                insert_stmt = f"""INSERT INTO icustays (row_id, subject_id, hadm_id, icustay_id, dbsource, first_careunit, last_careunit, first_wardid, last_wardid, intime, outtime, los) VALUES ({icustay_row_id}, {subject_id}, {hadm_id}, {icustay_id}, {dbsource}, {first_careunit}, {last_careunit}, {first_wardid}, {last_wardid}, {intime}, {outtime}, {los});"""
-                inserts.append(insert_stmt)
-                icustay_row_id += 1
-
-            # Insert diagnoses
-            for diagnosis_icd in admission.get("diagnoses_icd", []):
-                seq_num = diagnosis_icd.get("seq_num")
-                # Pad ICD9 code to 5 digits with leading zeros
-                raw_icd9_code = diagnosis_icd.get("icd9_code")
-                padded_icd9_code = pad_icd9_code(raw_icd9_code)
-                icd9_code = escape_sql_string(padded_icd9_code)
-
-                insert_stmt = f"""INSERT INTO diagnoses_icd (row_id, subject_id, hadm_id, seq_num, icd9_code) VALUES ({diagnoses_row_id}, {subject_id}, {hadm_id}, {seq_num}, {icd9_code});"""
-                inserts.append(insert_stmt)
-                diagnoses_row_id += 1
-
-    # Commit
-    inserts.append("")
-    inserts.append("COMMIT;")
-
-    # Write to file
-    with open(output_file, 'w') as f:
-        f.write('\n'.join(inserts))
-
-    print(f"✓ Generated {len(inserts)} SQL statements")
-    print(f"✓ Saved to: {output_file}")
-    return len(inserts)
-
-def load_noteevents_sql(noteevents_data, output_file):
-    """Generate SQL INSERT statements for noteevents"""
-    print(f"\n[GENERATE] Creating noteevents SQL INSERT statements...")
-
-    notevent_row_id = 1
-    inserts = []
-
-    inserts.append("BEGIN TRANSACTION;")
-    inserts.append("SET CONSTRAINTS ALL DEFERRED;")
-    inserts.append("")
-
-    for note in noteevents_data:
-        subject_id = note.get("subject_id")
-        hadm_id = note.get("hadm_id")
-        chartdate = escape_sql_string(note.get("chartdate"))
-        charttime = escape_sql_string(note.get("charttime"))
-        storetime = escape_sql_string(note.get("storetime"))
-        category = escape_sql_string(note.get("category"))
-        description = escape_sql_string(note.get("description"))
-        cgid = note.get("cgid")
-        if cgid is None:
-            cgid = "NULL"
-        iserror = note.get("iserror", 0)
-        text = escape_sql_string(note.get("text", ""))
-
-        insert_stmt = f"""INSERT INTO noteevents (row_id, subject_id, hadm_id, chartdate, charttime, storetime, category, description, cgid, iserror, text) VALUES ({notevent_row_id}, {subject_id}, {hadm_id}, {chartdate}, {charttime}, {storetime}, {category}, {description}, {cgid}, {iserror}, {text});"""
-        inserts.append(insert_stmt)
-        notevent_row_id += 1
-
-    inserts.append("")
-    inserts.append("COMMIT;")
-
-    with open(output_file, 'w') as f:
-        f.write('\n'.join(inserts))
-
-    print(f"✓ Generated {len(inserts)} noteevents SQL statements")
-    print(f"✓ Saved to: {output_file}")
-    return len(inserts)
+def iter_json_array(json_file, chunk_size=JSON_CHUNK_SIZE, start=None, with_offsets=False):
+    """Stream the elements of a top-level JSON array one at a time
+
+    Accepts a bare array as well as the jsonb_agg wrappers produced by the
+    export queries. Only the current read chunk and the element being decoded
+    are held in memory, so peak memory does not depend on the file size.
+
+    With with_offsets, yields (element, offset) where offset is the byte
+    position just past the element; passing such an offset as start resumes
+    the array right after that element.
+    """
+    print(f"[LOAD] Streaming JSON file: {json_file}")
+    decoder = json.JSONDecoder()
+    with open(json_file, 'rb') as raw:
+        if start is not None:
+            raw.seek(start)
+        # newline='' keeps characters and bytes in step for the offsets
+        f = io.TextIOWrapper(raw, encoding='utf-8', newline='')
+
+        # The first read must cover the opening bracket and any wrapper
+        buf = f.read(max(chunk_size, 4096))
+
+        if start is None:
+            opening = JSONB_AGG_RE.match(buf) or ARRAY_START_RE.match(buf)
+            if opening is None:
+                raise ValueError(f"{json_file} does not contain a JSON array")
+            pos = opening.end()
+        else:
+            pos = 0
+
+        # buf[mark] sits at byte mark_offset of the file
+        mark, mark_offset = 0, start or 0
+
+        while True:
+            pos = SEPARATOR_RE.match(buf, pos).end()
+            if pos < len(buf):
+                if buf[pos] == ']':
+                    return
+                try:
+                    element, end = decoder.raw_decode(buf, pos)
+                except json.JSONDecodeError:
+                    # Element is cut off at the end of the buffer, read more below
+                    pass
+                else:
+                    pos = end
+                    if with_offsets:
+                        mark_offset += len(buf[mark:end].encode('utf-8'))
+                        mark = end
+                        yield element, mark_offset
+                    else:
+                        yield element
+                    continue
+
+            more = f.read(chunk_size)
+            if not more:
+                raise ValueError(f"Unexpected end of JSON in {json_file}")
+            if with_offsets:
+                mark_offset += len(buf[mark:pos].encode('utf-8'))
+                mark = 0
+            buf = buf[pos:] + more
+            pos = 0
+
+class GzipMemberWriter(io.RawIOBase):
+    """Raw writer that gzips into a file as a series of gzip members
+
+    end_member() finishes the current member, leaving the file at a point
+    where it can be cut back to and appended to. Readers see the members
+    as one continuous stream.
+    """
+
+    def __init__(self, fileobj, compress_level=GZIP_LEVEL):
+        self.fileobj = fileobj
+        self.compress_level = compress_level
+        self.member = None
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        # Members open on first write, so ending one never leaves an empty member behind
+        if self.member is None:
+            self.member = gzip.GzipFile(filename='', mode='wb', fileobj=self.fileobj,
+                                        compresslevel=self.compress_level, mtime=0)
+        self.member.write(data)
+        return len(data)
+
+    def end_member(self):
+        """Finish the current member and return the compressed file size"""
+        if self.member is not None:
+            self.member.close()
+            self.member = None
+        self.fileobj.flush()
+        return self.fileobj.tell()
+
+    def close(self):
+        if not self.closed:
+            self.end_member()
+            self.fileobj.close()
+        super().close()
+
+class StatementWriter:
+    """Buffered line writer for generated files that reports bytes/s and lines/s
+
+    With a compress_level the file is written gzip-compressed.
+    """
+
+    def __init__(self, output_file, buffer_size=WRITE_BUFFER_SIZE, label=None, unit="statements", progress=True,
+                 append=False, compress_level=None):
+        self.output_file = output_file
+        self.label = label
+        self.unit = unit
+        self.progress = progress
+        mode = 'ab' if append else 'wb'
+        if compress_level is None:
+            self.gzip = None
+            self.file = open(output_file, mode, buffering=buffer_size)
+        else:
+            self.gzip = GzipMemberWriter(open(output_file, mode), compress_level)
+            self.file = io.BufferedWriter(self.gzip, buffer_size)
+            self.start_size = self.gzip.fileobj.tell()
+        self.compressed_bytes = None
+        self.statements = 0
+        self.bytes_written = 0
+        self.start_time = time.perf_counter()
+
+    def write(self, statement):
+        self.write_record(statement.encode('utf-8') + b'\n')
+
+    def write_raw(self, data):
+        """Write bytes that are not a record, such as file headers and trailers"""
+        self.file.write(data)
+        self.bytes_written += len(data)
+
+    def write_record(self, data):
+        self.file.write(data)
+        self.statements += 1
+        self.bytes_written += len(data)
+        if self.progress and self.statements % PROGRESS_INTERVAL == 0:
+            self.report(end='\r')
+
+    def report(self, end='\n'):
+        elapsed = max(time.perf_counter() - self.start_time, 1e-9)
+        mb_written = self.bytes_written / (1024 * 1024)
+        prefix = f"{self.label}: " if self.label else ""
+        compressed = ""
+        if self.compressed_bytes is not None and self.compressed_bytes > 0:
+            compressed = (f", {self.compressed_bytes / (1024 * 1024):.1f} MB gzipped "
+                          f"({self.bytes_written / self.compressed_bytes:.1f}x)")
+        print(f"  ✓ {prefix}Wrote {self.statements:,} {self.unit}, {mb_written:.1f} MB{compressed} "
+              f"({mb_written / elapsed:.1f} MB/s, {self.statements / elapsed:,.0f} {self.unit}/s)", end=end)
+
+    def flush(self):
+        """Hand buffered data to the OS and return the file size
+
+        Compressed output ends its gzip member here, so the file can later be
+        cut back to this size and appended to.
+        """
+        self.file.flush()
+        if self.gzip is None:
+            return self.file.tell()
+        return self.gzip.end_member()
+
+    def close(self):
+        if self.gzip is not None and not self.file.closed:
+            self.compressed_bytes = self.flush() - self.start_size
+        self.file.close()
+        if self.progress:
+            self.report()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+def new_row_ids():
+    """Return the starting row_id counter for every generated table"""
+    return {table: 1 for table in LOAD_ORDER}
+
+def flatten_patient(patient, row_ids):
+    """Yield (table, row) tuples for a patient and its nested records
+
+    Rows follow the column order in the schema; row_ids is advanced in place.
+    """
+    subject_id = patient.get("subject_id")
+
+    yield "patients", (
+        row_ids["patients"], subject_id, patient.get("gender"), patient.get("dob"),
+        patient.get("dod"), patient.get("dod_hosp"), patient.get("dod_ssn"),
+        patient.get("expire_flag", 0),
+    )
+    row_ids["patients"] += 1
+
+    for admission in patient.get("admissions") or []:
+        hadm_id = admission.get("hadm_id")
+        yield "admissions", (
+            row_ids["admissions"], subject_id, hadm_id, admission.get("admittime"),
+            admission.get("dischtime"), admission.get("deathtime"), admission.get("admission_type"),
+            admission.get("admission_location"), admission.get("discharge_location"),
+            admission.get("insurance"), admission.get("language"), admission.get("religion"),
+            admission.get("marital_status"), admission.get("ethnicity"), admission.get("edregtime"),
+            admission.get("edouttime"), admission.get("diagnosis"),
+            admission.get("hospital_expire_flag", 0), admission.get("has_chartevents_data", 0),
+        )
+        row_ids["admissions"] += 1
+
+        for icustay in admission.get("icustays") or []:
+            yield "icustays", (
+                row_ids["icustays"], subject_id, hadm_id, icustay.get("icustay_id"),
+                icustay.get("dbsource"), icustay.get("first_careunit"), icustay.get("last_careunit"),
+                icustay.get("first_wardid"), icustay.get("last_wardid"), icustay.get("intime"),
+                icustay.get("outtime"), icustay.get("los"),
+            )
+            row_ids["icustays"] += 1
+
+        for diagnosis_icd in admission.get("diagnoses_icd") or []:
+            # Map ICD9 code to the exact format of the reference table
+            icd9_code = pad_icd9_code(diagnosis_icd.get("icd9_code"))
+            yield "diagnoses_icd", (
+                row_ids["diagnoses_icd"], subject_id, hadm_id, diagnosis_icd.get("seq_num"), icd9_code,
+            )
+            row_ids["diagnoses_icd"] += 1
+
+def flatten_note(note, row_ids):
+    """Return the noteevents row for a note, advancing row_ids in place"""
+    row = (
+        row_ids["noteevents"], note.get("subject_id"), note.get("hadm_id"), note.get("chartdate"),
+        note.get("charttime"), note.get("storetime"), note.get("category"), note.get("description"),
+        note.get("cgid"), note.get("iserror", 0), note.get("text", ""),
+    )
+    row_ids["noteevents"] += 1
+    return row
+
+INSERT_PREFIX = {
+    table: f"INSERT INTO {table} ({', '.join(column_names(table))}) VALUES ("
+    for table in LOAD_ORDER
+}
+
+def format_insert(table, row):
+    """Format a row as a single-row INSERT statement"""
+    return INSERT_PREFIX[table] + ', '.join(escape_sql_string(value) for value in row) + ');'
+
+def format_multi_insert(table, rows):
+    """Format rows as one INSERT ... VALUES (...), (...) statement"""
+    return INSERT_PREFIX[table] + '), ('.join(
+        ', '.join(escape_sql_string(value) for value in row) for row in rows) + ');'
+
+class InsertBatcher:
+    """Pack rows into multi-row INSERT statements, one pending batch per table
+
+    A full batch flushes the batches of the tables before it in LOAD_ORDER
+    first, so parent rows are always inserted before the rows that reference
+    them.
+    """
+
+    def __init__(self, rows_per_insert=ROWS_PER_INSERT):
+        self.rows_per_insert = max(rows_per_insert, 1)
+        self.pending = {table: [] for table in LOAD_ORDER}
+
+    def add(self, table, row):
+        """Queue a row, returning any statements that are ready to write"""
+        if self.rows_per_insert == 1:
+            return [format_insert(table, row)]
+        rows = self.pending[table]
+        rows.append(row)
+        if len(rows) < self.rows_per_insert:
+            return []
+        return self.flush(table)
+
+    def flush(self, last_table=None):
+        """Return statements for the pending rows, up to last_table in load order"""
+        statements = []
+        for table in LOAD_ORDER:
+            if self.pending[table]:
+                statements.append(format_multi_insert(table, self.pending[table]))
+                self.pending[table] = []
+            if table == last_table:
+                break
+        return statements
+
+# Characters that must be backslash-escaped in COPY text format
+COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+def format_copy_value(value):
+    """Format a value for PostgreSQL's text COPY format"""
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    return str(value).translate(COPY_ESCAPES)
 
-def main():
-    print("\n" + "=" * 70)
-    print("SOEN363 PHASE 2 - JSON TO SQL CONVERTER")
-    print("Convert scaled JSON files to PostgreSQL INSERT statements")
-    print("=" * 70)
+def format_copy_row(row):
+    """Format a row as one tab-separated COPY line"""
+    return '\t'.join(format_copy_value(value) for value in row)
 
-    # Load patient data (use latest version if available)
+def write_copy_row(writer, table, row, binary):
+    if binary:
+        writer.write_record(encode_row(table, row))
+    else:
+        writer.write(format_copy_row(row))
+
+def flatten_note_rows(note, row_ids):
+    """Yield the (table, row) tuple of a note, like flatten_patient does for a patient"""
+    yield "noteevents", flatten_note(note, row_ids)
+
+def count_patient_rows(patient, row_ids):
+    """Advance row_ids past a patient's rows without building them"""
+    admissions = patient.get("admissions") or []
+    row_ids["patients"] += 1
+    row_ids["admissions"] += len(admissions)
+    for admission in admissions:
+        row_ids["icustays"] += len(admission.get("icustays") or [])
+        row_ids["diagnoses_icd"] += len(admission.get("diagnoses_icd") or [])
+
+def count_note_rows(note, row_ids):
+    """Advance row_ids past a note's row"""
+    row_ids["noteevents"] += 1
+
+# Tables, row builder and row counter of each conversion stage, in load order
+STAGES = {
+    "patients": (PATIENT_TABLES, flatten_patient, count_patient_rows),
+    "noteevents": (["noteevents"], flatten_note_rows, count_note_rows),
+}
+
+FORMAT_NAMES = {"sql": "SQL INSERT statements", "copy": "COPY files", "binary": "binary COPY files"}
+
+def stage_output_files(stage, output_format, compress_level=None):
+    """Return the files a stage writes, keyed "sql" or by table (.gz when compressed)"""
+    compressed = compress_level is not None
+    if output_format == "sql":
+        output_file = os.path.join(PROJECT_ROOT, "sql", f"insert_scaled_{stage}.sql")
+        return {"sql": output_file + ".gz" if compressed else output_file}
+    return {table: copy_file_path(table, COPY_DIR, output_format == "binary", compressed)
+            for table in STAGES[stage][0]}
+
+def open_stage_writers(output_files, buffer_size, shard_index=None, append=False, compress_level=None):
+    """Open a writer per output file, or per shard part of each output file"""
+    writers = {}
+    for key, output_file in output_files.items():
+        os.makedirs(os.path.dirname(output_file), exist_ok=True)
+        if shard_index is None:
+            writers[key] = StatementWriter(output_file, buffer_size, label=None if key == "sql" else key,
+                                           unit="statements" if key == "sql" else "rows", append=append,
+                                           compress_level=compress_level)
+        else:
+            writers[key] = StatementWriter(shard_file_path(output_file, shard_index), buffer_size,
+                                           progress=False, append=append, compress_level=compress_level)
+    return writers
+
+def close_writers(writers):
+    for writer in writers.values():
+        writer.close()
+
+def write_stage_header(writers, output_format):
+    """Open the transaction of an SQL file, or start each PGCOPY payload"""
+    if output_format == "sql":
+        for line in SQL_HEADER:
+            writers["sql"].write(line)
+    elif output_format == "binary":
+        for writer in writers.values():
+            writer.write_raw(PGCOPY_HEADER)
+
+def write_stage_footer(writers, output_format):
+    """Commit the transaction of an SQL file, or end each PGCOPY payload"""
+    if output_format == "sql":
+        for line in SQL_FOOTER:
+            writers["sql"].write(line)
+    elif output_format == "binary":
+        for writer in writers.values():
+            writer.write_raw(PGCOPY_TRAILER)
+
+def write_records(records, flatten, row_ids, output_format, writers, rows_per_insert=ROWS_PER_INSERT):
+    """Write one shard of records to open writers, advancing row_ids
+
+    Multi-row INSERT batches never span two shards, so a file comes out the
+    same however its shards are split between calls or processes.
+    """
+    if output_format == "sql":
+        writer = writers["sql"]
+        batcher = InsertBatcher(rows_per_insert)
+        for record in records:
+            for table, row in flatten(record, row_ids):
+                for statement in batcher.add(table, row):
+                    writer.write(statement)
+        for statement in batcher.flush():
+            writer.write(statement)
+    else:
+        binary = output_format == "binary"
+        for record in records:
+            for table, row in flatten(record, row_ids):
+                write_copy_row(writers[table], table, row, binary)
+
+def remove_outputs(path, keep_parts=0):
+    """Delete an output file and any shard parts left by an earlier run
+
+    The first keep_parts parts are kept, for a resumed parallel conversion.
+    The compressed (or uncompressed) variant of the file is always deleted,
+    so the loader never picks up a stale copy.
+    """
+    other = path[:-len(".gz")] if path.endswith(".gz") else path + ".gz"
+    for stale in [path, other] + shard_file_paths(path)[keep_parts:] + shard_file_paths(other):
+        if os.path.exists(stale):
+            os.remove(stale)
+
+def iter_shards(records, shard_size):
+    """Group a stream of records into lists of shard_size"""
+    shard = []
+    for record in records:
+        shard.append(record)
+        if len(shard) >= shard_size:
+            yield shard
+            shard = []
+    if shard:
+        yield shard
+
+def conversion_settings(json_file, output_format, rows_per_insert, shard_size, compress_level, parallel):
+    """Everything that changes a stage's output; a checkpoint only resumes under the same settings"""
+    return {
+        "inputs": input_signature([json_file]),
+        "format": output_format,
+        "rows_per_insert": rows_per_insert if output_format == "sql" else None,
+        "shard_size": shard_size,
+        "gzip_level": compress_level,
+        "parallel": parallel,
+    }
+
+def print_stage_outputs(stage, writers):
+    for key, writer in writers.items():
+        label = stage if key == "sql" else key
+        print(f"✓ {label}: {writer.statements:,} {writer.unit} saved to {writer.output_file}")
+
+def convert_stage(stage, json_file, output_format, buffer_size=WRITE_BUFFER_SIZE, rows_per_insert=ROWS_PER_INSERT,
+                  shard_size=SHARD_SIZE, resume=False, compress_level=None):
+    """Stream one JSON file into its output files, checkpointing after every shard
+
+    The checkpoint records the byte offset and subject_id of the last record
+    written, the row_id counters and the output sizes. With resume, the
+    outputs are cut back to those sizes and the JSON is read from that offset,
+    so the finished files match an uninterrupted run.
+    """
+    _, flatten, _ = STAGES[stage]
+    output_files = stage_output_files(stage, output_format, compress_level)
+    checkpoint_stage = f"convert_{stage}"
+    settings = conversion_settings(json_file, output_format, rows_per_insert, shard_size, compress_level,
+                                   parallel=False)
+    state = load_checkpoint(checkpoint_stage, settings) if resume else None
+    if state and state["complete"]:
+        print(f"\n✓ {stage} already converted ({state['records']:,} records), skipping")
+        return state["records"]
+
+    print(f"\n[GENERATE] Creating {stage} {FORMAT_NAMES[output_format]}...")
+    if state:
+        print(f"[RESUME] Continuing after subject_id {state['subject_id']} ({state['records']:,} records done)")
+        for key, output_file in output_files.items():
+            os.truncate(output_file, state["outputs"][key])
+        row_ids, offset, subject_id, records = state["row_ids"], state["offset"], state["subject_id"], state["records"]
+    else:
+        for output_file in output_files.values():
+            remove_outputs(output_file)
+        row_ids, offset, subject_id, records = new_row_ids(), None, None, 0
+
+    def checkpoint(complete=False):
+        save_checkpoint(checkpoint_stage, {
+            "settings": settings,
+            "offset": offset,
+            "subject_id": subject_id,
+            "row_ids": row_ids,
+            "records": records,
+            "outputs": {key: writer.flush() for key, writer in writers.items()},
+            "complete": complete,
+        })
+
+    writers = open_stage_writers(output_files, buffer_size, append=state is not None, compress_level=compress_level)
+    try:
+        if state is None:
+            write_stage_header(writers, output_format)
+        for shard in iter_shards(iter_json_array(json_file, start=offset, with_offsets=True), shard_size):
+            write_records([record for record, _ in shard], flatten, row_ids, output_format, writers, rows_per_insert)
+            records += len(shard)
+            last_record, offset = shard[-1]
+            subject_id = last_record.get("subject_id")
+            checkpoint()
+        write_stage_footer(writers, output_format)
+        checkpoint(complete=True)
+    finally:
+        close_writers(writers)
+
+    print_stage_outputs(stage, writers)
+    return records
+
+def count_slice_rows(json_file, start, end, count_rows):
+    """Count the rows a slice of the JSON array produces, per table
+
+    Runs in a worker process.
+    """
+    row_counts = {table: 0 for table in LOAD_ORDER}
+    for record in load_slice(json_file, start, end):
+        count_rows(record, row_counts)
+    return row_counts
+
+def plan_shards(pool, json_file, shard_size, count_rows):
+    """Split a JSON array into shards, returning [(start, end, row_ids)] in file order
+
+    The boundary scan runs here; the workers then parse and count their own
+    slices, and each shard starts at the row_ids left by the shards before it.
+    """
+    scan_start = time.perf_counter()
+    ranges = find_element_ranges(json_file)
+    print(f"  ✓ Found {len(ranges):,} elements in {time.perf_counter() - scan_start:.1f} s")
+
+    groups = group_ranges(ranges, shard_size)
+    counts = pool.map(count_slice_rows, [json_file] * len(groups), [start for start, _, _ in groups],
+                      [end for _, end, _ in groups], [count_rows] * len(groups))
+
+    shards = []
+    row_ids = new_row_ids()
+    for (start, end, _), row_counts in zip(groups, counts):
+        shards.append((start, end, dict(row_ids)))
+        for table, count in row_counts.items():
+            row_ids[table] += count
+    return shards
+
+def convert_shard(stage, shard_index, json_file, start, end, row_ids, output_format, buffer_size,
+                  rows_per_insert=ROWS_PER_INSERT, compress_level=None):
+    """Convert one slice of a JSON array into its own part files, starting at row_ids
+
+    Runs in a worker process. Only the first part gets the file header, so
+    the parts concatenate into the serial output. Returns the records
+    written, the subject_id of the last one and the lines written per file.
+    """
+    _, flatten, _ = STAGES[stage]
+    records = load_slice(json_file, start, end)
+    writers = open_stage_writers(stage_output_files(stage, output_format, compress_level), buffer_size, shard_index,
+                                 compress_level=compress_level)
+    try:
+        if shard_index == 0:
+            write_stage_header(writers, output_format)
+        write_records(records, flatten, row_ids, output_format, writers, rows_per_insert)
+    finally:
+        close_writers(writers)
+    last_subject_id = records[-1].get("subject_id") if records else None
+    return len(records), last_subject_id, {key: writer.statements for key, writer in writers.items()}
+
+def convert_stage_parallel(stage, json_file, output_format, workers, buffer_size=WRITE_BUFFER_SIZE,
+                           rows_per_insert=ROWS_PER_INSERT, shard_size=SHARD_SIZE, resume=False, compress_level=None):
+    """Convert one JSON file on a process pool, one output part per shard
+
+    Workers parse their own byte range of the memory-mapped JSON. Each shard's
+    starting row_ids come from counting the rows of the shards before it, so
+    the parts concatenate byte for byte into the serial output. The checkpoint
+    records how many leading shards are finished; resume keeps their parts.
+    """
+    output_files = stage_output_files(stage, output_format, compress_level)
+    checkpoint_stage = f"convert_{stage}"
+    settings = conversion_settings(json_file, output_format, rows_per_insert, shard_size, compress_level,
+                                   parallel=True)
+    state = load_checkpoint(checkpoint_stage, settings) if resume else None
+    if state and state["complete"]:
+        print(f"\n✓ {stage} already converted ({state['records']:,} records), skipping")
+        return state["records"]
+
+    print(f"\n[GENERATE] Creating {stage} {FORMAT_NAMES[output_format]} on {workers} processes "
+          f"({shard_size:,} records per shard)...")
+    shards_done = state["shards_done"] if state else 0
+    records = state["records"] if state else 0
+    subject_id = state["subject_id"] if state else None
+    if state:
+        print(f"[RESUME] Continuing after subject_id {state['subject_id']} ({shards_done:,} shards done)")
+    for output_file in output_files.values():
+        remove_outputs(output_file, keep_parts=shards_done)
+
+    start_time = time.perf_counter()
+    totals = {}
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        shards = plan_shards(pool, json_file, shard_size, STAGES[stage][2])
+        futures = [
+            pool.submit(convert_shard, stage, shard_index, json_file, start, end, row_ids,
+                        output_format, buffer_size, rows_per_insert, compress_level)
+            for shard_index, (start, end, row_ids) in enumerate(shards) if shard_index >= shards_done
+        ]
+        for future in futures:
+            shard_records, subject_id, counts = future.result()
+            for key, count in counts.items():
+                totals[key] = totals.get(key, 0) + count
+            shards_done += 1
+            records += shard_records
+            save_checkpoint(checkpoint_stage, {
+                "settings": settings,
+                "shards_done": shards_done,
+                "subject_id": subject_id,
+                "records": records,
+                "complete": False,
+            })
+            print(f"  ✓ Converted {shards_done:,}/{len(shards):,} shards", end='\r')
+    shard_count = len(shards)
+
+    # The last part closes the output, like the end of the serial file
+    writers = open_stage_writers(output_files, buffer_size, max(shard_count - 1, 0), append=True,
+                                 compress_level=compress_level)
+    try:
+        if shard_count == 0:
+            write_stage_header(writers, output_format)
+        write_stage_footer(writers, output_format)
+    finally:
+        close_writers(writers)
+    save_checkpoint(checkpoint_stage, {
+        "settings": settings,
+        "shards_done": shard_count,
+        "subject_id": subject_id,
+        "records": records,
+        "complete": True,
+    })
+
+    elapsed = time.perf_counter() - start_time
+    print(f"\n✓ Converted {shard_count:,} shards in {elapsed:.1f} s")
+    for key, count in totals.items():
+        print(f"✓ {stage if key == 'sql' else key}: {count:,} lines written")
+    for output_file in output_files.values():
+        print(f"✓ Saved to: {shard_file_path(output_file, 0)} ... ({max(shard_count, 1)} parts)")
+    return records
+
+def find_patients_json():
+    """Return the patients JSON to convert (use latest version if available)"""
     patients_json_new = os.path.join(PROJECT_ROOT, "scaled_JSON_output_patients.json")
     patients_json_updated = os.path.join(PROJECT_ROOT, "scaled_JSON_output_updated.json")
     patients_json_original = os.path.join(PROJECT_ROOT, "scaled_JSON_output.json")
 
     if os.path.exists(patients_json_new):
-        patients_json = patients_json_new
         print("[LOAD] Using NEW patients JSON with fixed ICD9 codes")
+        return patients_json_new
     elif os.path.exists(patients_json_updated):
-        patients_json = patients_json_updated
         print("[LOAD] Using updated JSON with cleaned ICD9 codes")
+        return patients_json_updated
     else:
-        patients_json = patients_json_original
         print("[LOAD] Using original JSON")
+        return patients_json_original
 
-    patients_data = load_json(patients_json)
-
-    if not patients_data:
-        print("✗ Failed to load patient data")
-        return
-
-    print(f"✓ Loaded {len(patients_data):,} patients")
-
-    # Generate SQL for patients
-    patients_sql = os.path.join(PROJECT_ROOT, "sql", "insert_scaled_patients.sql")
-    os.makedirs(os.path.dirname(patients_sql), exist_ok=True)
-    generate_sql_inserts(patients_data, patients_sql)
-
-    # Load noteevents data (use original or updated - both are compatible)
+def find_noteevents_json():
+    """Return the noteevents JSON to convert, or None if there is none"""
+    # Use original or updated - both are compatible
     # Note: No FK constraint issues with noteevents since it has no ICD9 code references
     noteevents_json_updated = os.path.join(PROJECT_ROOT, "scaled_JSON_output_notes_updated.json")
     noteevents_json_original = os.path.join(PROJECT_ROOT, "scaled_JSON_output_notes.json")
 
-    noteevents_data = []
-
     if os.path.exists(noteevents_json_updated):
         print("[LOAD] Using updated noteevents JSON")
-        noteevents_data = load_json(noteevents_json_updated)
+        return noteevents_json_updated
     elif os.path.exists(noteevents_json_original):
         print("[LOAD] Using original noteevents JSON")
-        noteevents_data = load_json(noteevents_json_original)
+        return noteevents_json_original
     else:
         print("[LOAD] Note: No noteevents JSON file found")
         print("[LOAD] Continuing with patients data only")
-        noteevents_data = []
+        return None
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Convert scaled JSON files to PostgreSQL INSERT statements or COPY payloads")
+    parser.add_argument("--format", choices=["sql", "copy", "binary"], default="sql",
+                        help="sql: INSERT scripts in sql/, copy: tab-separated COPY files in sql/copy_scaled/, "
+                             "binary: PGCOPY binary files in sql/copy_scaled/ (default: %(default)s)")
+    parser.add_argument("--buffer-mb", type=float, default=WRITE_BUFFER_SIZE / (1024 * 1024),
+                        help="Write buffer size for the generated files, in MB (default: %(default)s)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Convert on this many processes, writing one part file per shard (default: %(default)s)")
+    parser.add_argument("--shard-size", type=int, default=SHARD_SIZE,
+                        help="Patients or notes per shard; a checkpoint is saved after each shard (default: %(default)s)")
+    parser.add_argument("--rows-per-insert", type=int, default=ROWS_PER_INSERT,
+                        help="Rows per INSERT ... VALUES statement with --format sql; 1 writes one statement per row "
+                             "(default: %(default)s)")
+    parser.add_argument("--gzip", action="store_true",
+                        help="Write gzip-compressed output (.sql.gz, .tsv.gz, .bin.gz)")
+    parser.add_argument("--gzip-level", type=int, default=GZIP_LEVEL, choices=range(1, 10), metavar="1-9",
+                        help="gzip compression level with --gzip (default: %(default)s)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue an interrupted conversion from sql/checkpoint.json")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    buffer_size = max(int(args.buffer_mb * 1024 * 1024), 1)
+    compress_level = args.gzip_level if args.gzip else None
+
+    print("\n" + "=" * 70)
+    print("SOEN363 PHASE 2 - JSON TO SQL CONVERTER")
+    if args.format == "copy":
+        print("Convert scaled JSON files to PostgreSQL COPY payloads")
+    elif args.format == "binary":
+        print("Convert scaled JSON files to PostgreSQL binary COPY payloads")
+    else:
+        print("Convert scaled JSON files to PostgreSQL INSERT statements")
+    print("=" * 70)
+
+    patients_json = find_patients_json()
+    if not os.path.exists(patients_json):
+        print(f"✗ Patient JSON not found: {patients_json}")
+        return
+
+    if not args.resume:
+        clear_checkpoints([f"convert_{stage}" for stage in STAGES])
+
+    def convert(stage, json_file):
+        if args.workers > 1:
+            convert_stage_parallel(stage, json_file, args.format, args.workers, buffer_size,
+                                   args.rows_per_insert, args.shard_size, args.resume, compress_level)
+        else:
+            convert_stage(stage, json_file, args.format, buffer_size, args.rows_per_insert,
+                          args.shard_size, args.resume, compress_level)
 
-    if noteevents_data:
-        print(f"✓ Loaded {len(noteevents_data):,} note events")
-        noteevents_sql = os.path.join(PROJECT_ROOT, "sql", "insert_scaled_noteevents.sql")
-        load_noteevents_sql(noteevents_data, noteevents_sql)
+    # Convert patients, streaming one shard at a time
+    try:
+        convert("patients", patients_json)
+    except (OSError, ValueError) as e:
+        print(f"✗ Failed to convert patient data: {e}")
+        return
+
+    noteevents_json = find_noteevents_json()
+    if noteevents_json:
+        try:
+            convert("noteevents", noteevents_json)
+        except (OSError, ValueError) as e:
+            print(f"✗ Failed to convert noteevents data: {e}")
+            return
     else:
         print("[INFO] Skipping noteevents SQL generation")
 
     print("\n" + "=" * 70)
-    print("✓ SQL files generated successfully!")
-    print("=" * 70)
-    print("\nNext steps:")
-    print("1. Run: psql -U admin -d hospital_db < sql/insert_scaled_patients.sql")
-    print("2. Run: psql -U admin -d hospital_db < sql/insert_scaled_noteevents.sql")
-    print("3. Then use load_to_mongodb.py to migrate to MongoDB")
+    if args.format in ("copy", "binary"):
+        print("✓ COPY files generated successfully!")
+        print("=" * 70)
+        print("\nNext steps:")
+        print(f"1. Run: python scripts/load_sql_to_postgres.py --format {args.format}")
+        print("2. Then use load_to_mongodb_fast.py to migrate to MongoDB")
+    else:
+        print("✓ SQL files generated successfully!")
+        print("=" * 70)
+        print("\nNext steps:")
+        if args.gzip:
+            print("1. Run: python scripts/load_sql_to_postgres.py (decompresses on the fly)")
+            print("2. Then use load_to_mongodb.py to migrate to MongoDB")
+        else:
+            print("1. Run: psql -U admin -d hospital_db < sql/insert_scaled_patients.sql")
+            print("2. Run: psql -U admin -d hospital_db < sql/insert_scaled_noteevents.sql")
+            print("3. Then use load_to_mongodb.py to migrate to MongoDB")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+SOEN363 Phase 2 - Load Format Benchmark (INSERT vs text COPY vs binary COPY)
+
+This script loads the scaled dataset into PostgreSQL once per format and
+compares how long each table takes:
+- insert: the INSERT scripts in sql/ (load_sql_file)
+- copy:   the tab-separated COPY files in sql/copy_scaled/
+- binary: the PGCOPY binary files in sql/copy_scaled/
+Each format also has a -gz variant that loads the gzip-compressed files
+written by json_to_sql_converter.py --gzip, decompressing on the fly.
+
+Generate the inputs first (add --gzip for the -gz formats):
+    python scripts/json_to_sql_converter.py --format sql
+    python scripts/json_to_sql_converter.py --format copy
+    python scripts/json_to_sql_converter.py --format binary
+
+or pass --convert to run the converter before every load and record
+conversion plus load as the end-to-end time.
+
+USAGE:
+    python scripts/load_format_benchmark.py
+    python scripts/load_format_benchmark.py --runs 3 --formats copy binary
+    python scripts/load_format_benchmark.py --convert --formats insert insert-gz
+
+The target tables are truncated before every run. Results are appended to:
+    reports/performance_test_results/performance_test_load_formats.csv
+"""
+
+import argparse
+import csv
+import gzip
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+from hospital_schema import LOAD_ORDER, copy_file_path, shard_file_paths
+from load_sql_to_postgres import PROJECT_ROOT, connect_to_postgres, load_copy_file, load_sql_file
+
+
+# ================================
+# CONFIG
+# ================================
+REPORTS_DIR = os.path.join(PROJECT_ROOT, "reports", "performance_test_results")
+OUTPUT_CSV = os.path.join(REPORTS_DIR, "performance_test_load_formats.csv")
+
+FORMATS = ["insert", "copy", "binary", "insert-gz", "copy-gz", "binary-gz"]
+
+CONVERTER = os.path.join(PROJECT_ROOT, "scripts", "json_to_sql_converter.py")
+CONVERTER_FORMATS = {"insert": "sql", "copy": "copy", "binary": "binary"}
+
+FIELDNAMES = ["timestamp", "format", "run", "table", "input_mb", "uncompressed_mb", "compression_ratio",
+              "duration_seconds", "convert_seconds", "end_to_end_seconds"]
+
+INSERT_FILES = [
+    ("patients", os.path.join(PROJECT_ROOT, "sql", "insert_scaled_patients.sql")),
+    ("noteevents", os.path.join(PROJECT_ROOT, "sql", "insert_scaled_noteevents.sql")),
+]
+
+
+# ================================
+# Helpers
+# ================================
+
+def split_format(fmt):
+    """Return (base format, compressed) for a benchmark format name"""
+    base, _, suffix = fmt.partition("-")
+    return base, suffix == "gz"
+
+def format_inputs(fmt):
+    """Return [(label, path)] for the files a format loads, in load order"""
+    base, compressed = split_format(fmt)
+    if base == "insert":
+        inputs = INSERT_FILES
+    else:
+        inputs = [(table, copy_file_path(table, binary=base == "binary")) for table in LOAD_ORDER]
+    if compressed:
+        inputs = [(label, path + ".gz") for label, path in inputs]
+    return inputs
+
+def input_files(path):
+    """Return the file, or the parts of a parallel conversion, that hold one input"""
+    if os.path.exists(path):
+        return [path]
+    return shard_file_paths(path)
+
+def uncompressed_size(paths):
+    """Return the total decompressed size of the given files in bytes"""
+    total = 0
+    for path in paths:
+        if not path.endswith(".gz"):
+            total += os.path.getsize(path)
+            continue
+        with gzip.open(path, 'rb') as f:
+            while True:
+                chunk = f.read(1024 * 1024)
+                if not chunk:
+                    break
+                total += len(chunk)
+    return total
+
+def run_converter(fmt):
+    """Regenerate a format's inputs with json_to_sql_converter.py, returning the seconds taken"""
+    base, compressed = split_format(fmt)
+    command = [sys.executable, CONVERTER, "--format", CONVERTER_FORMATS[base]]
+    if compressed:
+        command.append("--gzip")
+    start = time.perf_counter()
+    result = subprocess.run(command, stdout=subprocess.DEVNULL)
+    duration = time.perf_counter() - start
+    if result.returncode != 0:
+        print(f"✗ Converter failed for {fmt}")
+        return None
+    return duration
+
+
+def truncate_tables(conn):
+    """Empty the scaled tables so every run starts from the same state"""
+    cursor = conn.cursor()
+    cursor.execute(f"TRUNCATE {', '.join(reversed(LOAD_ORDER))}")
+    conn.commit()
+    cursor.close()
+
+
+def run_format(conn, fmt, run, convert=False):
+    """Load every input of one format, returning a result row per input plus a total
+
+    With convert, the inputs are regenerated first and the total row also
+    records conversion and end-to-end (conversion + load) seconds.
+    Returns an empty list if conversion or any load fails.
+    """
+    convert_seconds = None
+    if convert:
+        convert_seconds = run_converter(fmt)
+        if convert_seconds is None:
+            return []
+
+    base, _ = split_format(fmt)
+    truncate_tables(conn)
+    results = []
+    total = 0.0
+    total_bytes = 0
+    total_uncompressed = 0
+
+    for label, path in format_inputs(fmt):
+        start = time.perf_counter()
+        if base == "insert":
+            ok = load_sql_file(conn, path, label)
+        else:
+            ok = load_copy_file(conn, path, label, binary=base == "binary")
+        duration = time.perf_counter() - start
+
+        if not ok:
+            print(f"✗ {fmt} load of {label} failed, skipping this run")
+            return []
+
+        paths = input_files(path)
+        input_bytes = sum(os.path.getsize(p) for p in paths)
+        raw_bytes = uncompressed_size(paths)
+        total += duration
+        total_bytes += input_bytes
+        total_uncompressed += raw_bytes
+        results.append({
+            "timestamp": datetime.now().isoformat(),
+            "format": fmt,
+            "run": run,
+            "table": label,
+            "input_mb": round(input_bytes / (1024 * 1024), 2),
+            "uncompressed_mb": round(raw_bytes / (1024 * 1024), 2),
+            "compression_ratio": round(raw_bytes / max(input_bytes, 1), 2),
+            "duration_seconds": round(duration, 3),
+        })
+
+    results.append({
+        "timestamp": datetime.now().isoformat(),
+        "format": fmt,
+        "run": run,
+        "table": "total",
+        "input_mb": round(total_bytes / (1024 * 1024), 2),
+        "uncompressed_mb": round(total_uncompressed / (1024 * 1024), 2),
+        "compression_ratio": round(total_uncompressed / max(total_bytes, 1), 2),
+        "duration_seconds": round(total, 3),
+        "convert_seconds": round(convert_seconds, 3) if convert else "",
+        "end_to_end_seconds": round(convert_seconds + total, 3) if convert else "",
+    })
+    return results
+
+
+# ================================
+# CSV writer
+# ================================
+
+def write_csv(path, rows):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    file_exists = os.path.isfile(path)
+
+    # Results from before the compression columns existed are carried over with those columns empty
+    if file_exists:
+        with open(path, newline="") as f:
+            reader = csv.DictReader(f)
+            if reader.fieldnames != FIELDNAMES:
+                rows = list(reader) + rows
+                file_exists = False
+
+    with open(path, "a" if file_exists else "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDNAMES, restval="")
+        if not file_exists:
+            writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+
+    print(f"[DONE] Results saved to: {path}")
+
+
+# ================================
+# Entry point
+# ================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare INSERT, text COPY and binary COPY load times")
+    parser.add_argument("--runs", type=int, default=1, help="Runs per format (default: %(default)s)")
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=FORMATS[:3],
+                        help="Formats to benchmark (default: insert copy binary)")
+    parser.add_argument("--convert", action="store_true",
+                        help="Run the converter before each load and record end-to-end time")
+    args = parser.parse_args()
+
+    if not args.convert:
+        for fmt in args.formats:
+            missing = [path for _, path in format_inputs(fmt) if not input_files(path)]
+            if missing:
+                print(f"ERROR: missing {fmt} input {missing[0]}")
+                print("Generate it with json_to_sql_converter.py first, or pass --convert")
+                return
+
+    conn = connect_to_postgres()
+    results = []
+    try:
+        for run in range(1, args.runs + 1):
+            for fmt in args.formats:
+                print(f"\n[RUNNING] Format: {fmt} (run {run}/{args.runs})")
+                results.extend(run_format(conn, fmt, run, args.convert))
+    finally:
+        conn.close()
+
+    write_csv(OUTPUT_CSV, results)
+
+    print("\n" + "=" * 70)
+    print("LOAD FORMAT SUMMARY (average total seconds)")
+    print("=" * 70)
+    averages = {}
+    for fmt in args.formats:
+        totals = [r for r in results if r["format"] == fmt and r["table"] == "total"]
+        if totals:
+            averages[fmt] = (sum(r["duration_seconds"] for r in totals) / len(totals), totals[-1])
+        else:
+            print(f"  {fmt:<10} failed")
+    baseline = averages.get("insert", (None,))[0]
+    for fmt, (avg, total) in averages.items():
+        speedup = f" ({baseline / avg:.1f}x faster than insert)" if baseline and fmt != "insert" else ""
+        size = f"{total['input_mb']:.1f} MB on disk"
+        if split_format(fmt)[1]:
+            size += f", {total['compression_ratio']:.1f}x compressed"
+        end_to_end = f", {total['end_to_end_seconds']:.2f} s end to end" if args.convert else ""
+        print(f"  {fmt:<10} {avg:8.2f} s load{end_to_end} ({size}){speedup}")
+
+
+if __name__ == "__main__":
+    main()
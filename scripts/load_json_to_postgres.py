@@ -0,0 +1,164 @@
+"""
+SOEN363 Phase 2 - Stream JSON Directly into PostgreSQL
+Flatten the scaled JSON files and COPY the rows straight into PostgreSQL,
+without writing the intermediate SQL or COPY files
+
+The main process scans the memory-mapped JSON for element boundaries and cuts
+it into shards of patients (then notes). Each worker process parses its own
+slice, holds its own connection and loads the shard in a single transaction,
+feeding COPY ... FROM STDIN from a generator of encoded rows. A shard carries
+a patient with all of its admissions, ICU stays and diagnoses, so every
+transaction satisfies its own foreign keys and the connections can commit
+independently.
+
+USAGE:
+    python scripts/load_json_to_postgres.py
+    python scripts/load_json_to_postgres.py --workers 8 --format binary
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import psycopg2
+
+from hospital_schema import PATIENT_TABLES
+from json_boundaries import load_slice
+from json_to_sql_converter import (SHARD_SIZE, count_note_rows, count_patient_rows, find_noteevents_json,
+                                   find_patients_json, flatten_note, flatten_patient, format_copy_row,
+                                   plan_shards)
+from load_sql_to_postgres import (COPY_READ_SIZE, POSTGRES_CONFIG, IteratorReader, connect_to_postgres,
+                                  copy_statement, log_sql_load_performance, verify_data)
+from pgcopy_binary import PGCOPY_HEADER, PGCOPY_TRAILER, encode_row
+
+# Connection held by each worker process for the lifetime of the pool
+worker_conn = None
+
+def iter_copy_data(table, rows, binary=False):
+    """Yield a table's rows encoded as a text or PGCOPY binary COPY stream"""
+    if binary:
+        yield PGCOPY_HEADER
+        for row in rows:
+            yield encode_row(table, row)
+        yield PGCOPY_TRAILER
+    else:
+        for row in rows:
+            yield (format_copy_row(row) + '\n').encode('utf-8')
+
+def open_worker_connection():
+    """Pool initializer: open the connection this worker loads its shards on"""
+    global worker_conn
+    worker_conn = psycopg2.connect(**POSTGRES_CONFIG)
+
+def copy_tables(tables, rows, binary):
+    """COPY each table's rows on the worker connection and commit them together"""
+    cursor = worker_conn.cursor()
+    try:
+        for table in tables:
+            reader = IteratorReader(iter_copy_data(table, rows[table], binary))
+            cursor.copy_expert(copy_statement(table, binary), reader, size=COPY_READ_SIZE)
+        worker_conn.commit()
+    except Exception:
+        worker_conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    return {table: len(rows[table]) for table in tables}
+
+def copy_patient_shard(json_file, start, end, row_ids, binary):
+    """Load one slice of patients and their nested records, starting at row_ids"""
+    rows = {table: [] for table in PATIENT_TABLES}
+    for patient in load_slice(json_file, start, end):
+        for table, row in flatten_patient(patient, row_ids):
+            rows[table].append(row)
+    return copy_tables(PATIENT_TABLES, rows, binary)
+
+def copy_note_shard(json_file, start, end, row_ids, binary):
+    """Load one slice of noteevents, starting at row_ids"""
+    rows = {"noteevents": [flatten_note(note, row_ids) for note in load_slice(json_file, start, end)]}
+    return copy_tables(["noteevents"], rows, binary)
+
+def load_shards(pool, json_file, shard_size, count_rows, copy_shard, binary):
+    """Load a JSON array on the pool shard by shard, returning the rows loaded per table
+
+    row_ids for each shard are planned up front, so the ids match what
+    json_to_sql_converter.py assigns.
+    """
+    shards = plan_shards(pool, json_file, shard_size, count_rows)
+    futures = [pool.submit(copy_shard, json_file, start, end, row_ids, binary) for start, end, row_ids in shards]
+
+    totals = {}
+    for done, future in enumerate(futures, 1):
+        for table, count in future.result().items():
+            totals[table] = totals.get(table, 0) + count
+        print(f"  ✓ Loaded {done:,}/{len(shards):,} shards", end='\r')
+    print()
+    return totals
+
+def run_phase(pool, workers, label, json_file, shard_size, count_rows, copy_shard, binary):
+    """Load one JSON file and log how long it took"""
+    print(f"\n[LOAD] Streaming {label} into PostgreSQL on {workers} connections...")
+    start_time = time.perf_counter()
+    totals = load_shards(pool, json_file, shard_size, count_rows, copy_shard, binary)
+    duration = time.perf_counter() - start_time
+
+    for table, count in totals.items():
+        print(f"✓ Copied {count:,} rows into {table}")
+    print(f"  Duration: {duration:.2f} seconds ({duration/60:.1f} minutes)")
+    log_sql_load_performance(f"{label} (direct)", duration)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Stream the scaled JSON files straight into PostgreSQL with COPY")
+    parser.add_argument("--format", choices=["copy", "binary"], default="copy",
+                        help="COPY stream format sent to the server (default: %(default)s)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Worker processes, each with its own connection (default: %(default)s)")
+    parser.add_argument("--shard-size", type=int, default=SHARD_SIZE,
+                        help="Patients or notes loaded per transaction (default: %(default)s)")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    binary = args.format == "binary"
+    workers = max(args.workers, 1)
+
+    print("\n" + "=" * 70)
+    print("SOEN363 PHASE 2 - STREAM JSON TO POSTGRESQL")
+    print(f"Flatten JSON and {args.format} COPY it straight into PostgreSQL (no intermediate files)")
+    print("=" * 70)
+
+    patients_json = find_patients_json()
+    if not os.path.exists(patients_json):
+        print(f"✗ Patient JSON not found: {patients_json}")
+        sys.exit(1)
+    noteevents_json = find_noteevents_json()
+
+    conn = connect_to_postgres()
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=open_worker_connection) as pool:
+            # Notes reference patients and admissions, so they load afterwards
+            run_phase(pool, workers, "patients", patients_json, args.shard_size,
+                      count_patient_rows, copy_patient_shard, binary)
+            if noteevents_json:
+                run_phase(pool, workers, "noteevents", noteevents_json, args.shard_size,
+                          count_note_rows, copy_note_shard, binary)
+    except Exception as e:
+        print(f"\n✗ Streaming load failed: {str(e)[:200]}")
+        print("  Shards committed before the failure remain; run clear_postgres_data.py before retrying")
+        conn.close()
+        sys.exit(1)
+
+    if verify_data(conn):
+        print("\n" + "=" * 70)
+        print("✓ All data loaded successfully!")
+        print("=" * 70)
+        print("\nNext step: Run load_to_mongodb_fast.py to migrate to MongoDB")
+    else:
+        print("\n✗ Verification failed")
+
+    conn.close()
+
+if __name__ == "__main__":
+    main()
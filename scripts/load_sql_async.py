@@ -0,0 +1,183 @@
+"""
+SOEN363 Phase 2 - Pipelined SQL Loader
+Execute the generated INSERT scripts with asyncio and psycopg 3 pipeline mode,
+keeping up to --depth statements in flight on each connection instead of
+waiting one round trip per statement
+
+Each of --connections connections takes whole SQL files (or the shard parts
+of a parallel conversion) from a queue and loads each one in a single
+transaction, syncing the pipeline every --depth statements. noteevents start
+once every patients file has committed. Given several --depths, the load is
+repeated once per depth with the tables truncated in between, and the
+throughput of each depth is reported, so the depth can be tuned to the
+latency of the link to the server.
+
+Unlike load_sql_to_postgres.py, a failing statement rolls back its whole
+file; rows are not bisected into a reject file.
+
+Requires psycopg 3: pip install "psycopg[binary]"
+
+USAGE:
+    python scripts/load_sql_async.py
+    python scripts/load_sql_async.py --connections 4 --depths 1 8 32 128
+"""
+
+import argparse
+import asyncio
+import csv
+import os
+import sys
+import time
+from datetime import datetime
+
+import psycopg
+
+from load_format_benchmark import truncate_tables
+from load_sql_to_postgres import (POSTGRES_CONFIG, PROJECT_ROOT, connect_to_postgres, iter_statement_batches,
+                                  log_sql_load_performance, open_input, sql_groups, verify_data)
+
+# Statements sent before each pipeline sync
+DEFAULT_DEPTH = 64
+
+DEPTH_CSV = os.path.join(PROJECT_ROOT, "reports", "performance_test_results", "performance_test_pipeline_depth.csv")
+DEPTH_FIELDS = ["timestamp", "depth", "connections", "statements", "input_mb", "duration_seconds",
+                "statements_per_second", "mb_per_second"]
+
+def async_config(config):
+    """Return psycopg 3 connection keywords for a psycopg2-style config"""
+    settings = dict(config)
+    settings["dbname"] = settings.pop("database")
+    return settings
+
+async def load_file(conn, path, depth):
+    """Run one SQL file in a single transaction, depth statements per pipeline sync
+
+    Returns the number of statements executed.
+    """
+    statements = 0
+    async with conn.transaction():
+        async with conn.pipeline() as pipeline, conn.cursor() as cursor:
+            with open_input(path, 'r', encoding='utf-8', newline='') as f:
+                for batch in iter_statement_batches(f, depth):
+                    for statement in batch:
+                        await cursor.execute(statement)
+                    await pipeline.sync()
+                    statements += len(batch)
+    return statements
+
+async def run_connection(config, queue, depth, results):
+    """Load files from queue on one connection until it is empty"""
+    # Every statement is different text, so server-side prepared statements would never be reused
+    async with await psycopg.AsyncConnection.connect(autocommit=True, prepare_threshold=None, **config) as conn:
+        while not queue.empty():
+            path = queue.get_nowait()
+            results.append((path, await load_file(conn, path, depth)))
+
+async def load_pipelined(groups, connections, depth, config):
+    """Load every group of files, in dependency order, on connections pipelined connections
+
+    Returns the number of statements executed.
+    """
+    statements = 0
+    for label, (partitions, _) in groups.items():
+        queue = asyncio.Queue()
+        for path, *_ in partitions:
+            queue.put_nowait(path)
+
+        print(f"  [{label}] {len(partitions)} file(s) on {min(connections, len(partitions))} connection(s)...")
+        start = time.perf_counter()
+        results = []
+        await asyncio.gather(*(run_connection(config, queue, depth, results)
+                               for _ in range(min(connections, len(partitions)))))
+        duration = time.perf_counter() - start
+        count = sum(n for _, n in results)
+        statements += count
+        print(f"  ✓ {label}: {count:,} statements in {duration:.2f} seconds")
+    return statements
+
+def write_depth_results(rows):
+    """Append one row per measured depth to the pipeline depth CSV"""
+    os.makedirs(os.path.dirname(DEPTH_CSV), exist_ok=True)
+    file_exists = os.path.isfile(DEPTH_CSV)
+    with open(DEPTH_CSV, "a", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=DEPTH_FIELDS)
+        if not file_exists:
+            writer.writeheader()
+        writer.writerows(rows)
+    print(f"[DONE] Results saved to: {DEPTH_CSV}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Load the INSERT scripts with pipelined async connections")
+    parser.add_argument("--connections", type=int, default=2,
+                        help="Pipelined connections, each loading whole files (default: %(default)s)")
+    parser.add_argument("--depths", type=int, nargs="+", default=[DEFAULT_DEPTH],
+                        help="Statements in flight per connection; several values run one load each, "
+                             "truncating the tables in between (default: %(default)s)")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    connections = max(args.connections, 1)
+    depths = [max(depth, 1) for depth in args.depths]
+
+    print("\n" + "=" * 70)
+    print("SOEN363 PHASE 2 - PIPELINED SQL LOAD")
+    print(f"psycopg {psycopg.__version__} pipeline mode, {connections} connection(s), depth(s) {depths}")
+    print("=" * 70)
+
+    if not psycopg.Pipeline.is_supported():
+        print("✗ Pipeline mode needs libpq 14 or newer; reinstall with pip install \"psycopg[binary]\"")
+        sys.exit(1)
+
+    groups = sql_groups()
+    if groups is None:
+        sys.exit(1)
+    input_bytes = sum(os.path.getsize(path) for partitions, _ in groups.values() for path, *_ in partitions)
+
+    conn = connect_to_postgres()
+    results = []
+    for depth in depths:
+        if len(depths) > 1:
+            truncate_tables(conn)
+        print(f"\n[LOAD] Pipeline depth {depth}...")
+        start = time.perf_counter()
+        try:
+            statements = asyncio.run(load_pipelined(groups, connections, depth, async_config(POSTGRES_CONFIG)))
+        except psycopg.Error as e:
+            print(f"\n✗ Pipelined load failed: {str(e)[:200]}")
+            print("  Files committed before the failure remain; run load_sql_to_postgres.py to isolate bad rows")
+            conn.close()
+            sys.exit(1)
+        duration = time.perf_counter() - start
+
+        results.append({
+            "timestamp": datetime.now().isoformat(),
+            "depth": depth,
+            "connections": connections,
+            "statements": statements,
+            "input_mb": round(input_bytes / 1024 / 1024, 2),
+            "duration_seconds": round(duration, 2),
+            "statements_per_second": round(statements / duration) if duration else "",
+            "mb_per_second": round(input_bytes / 1024 / 1024 / duration, 2) if duration else "",
+        })
+        log_sql_load_performance(f"sql load (pipelined, depth {depth}, {connections} connections)",
+                                 duration, input_bytes=input_bytes)
+
+    write_depth_results(results)
+
+    print("\n" + "=" * 70)
+    print("THROUGHPUT BY PIPELINE DEPTH")
+    print("=" * 70)
+    print(f"  {'depth':>6} {'seconds':>9} {'stmt/s':>10} {'MB/s':>8}")
+    for row in results:
+        print(f"  {row['depth']:>6} {row['duration_seconds']:>9.2f} {row['statements_per_second']:>10,} "
+              f"{row['mb_per_second']:>8}")
+
+    if verify_data(conn):
+        print("\n✓ All data loaded successfully!")
+    else:
+        print("\n✗ Verification failed")
+    conn.close()
+
+if __name__ == "__main__":
+    main()
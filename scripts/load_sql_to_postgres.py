@@ -4,32 +4,82 @@ Execute generated SQL INSERT statements in PostgreSQL
 """
 
 import psycopg2
+import argparse
+import gzip
+import itertools
+import mmap
 import os
 import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime
+from functools import partial
 
 import csv
 
-def log_sql_load_performance(label, duration_seconds):
-    """Append SQL load duration to CSV log."""
+from bulk_load import drop_schema_objects, rebuild_schema_objects, saved_schema_objects
+from checkpoint import clear_checkpoints, input_signature, load_checkpoint, save_checkpoint
+from hospital_schema import LOAD_ORDER, column_names, copy_file_path, shard_file_paths, table_dependencies
+from load_telemetry import LoadTelemetry
+from pgcopy_binary import PGCOPY_HEADER, PGCOPY_TRAILER, tuple_ranges
+from sql_statements import iter_sql_statements, split_insert_rows
+from staging_load import (create_staging_tables, drop_staging_tables, merge_staging_tables, staging_config,
+                          staging_tables_exist)
+
+# Read size used when streaming COPY payloads to the server
+COPY_READ_SIZE = 1024 * 1024
+
+# Statements executed per round trip and transaction (up to 100,000 rows with multi-row INSERTs);
+# a batch that fails is bisected to find the rows to reject
+STATEMENT_BATCH_SIZE = 1000
+
+# The loader commits each batch itself, so the scripts' own transaction control is skipped
+TRANSACTION_STATEMENTS = {"BEGIN TRANSACTION;", "SET CONSTRAINTS ALL DEFERRED;", "COMMIT;"}
+
+# Size of the byte ranges an uncompressed COPY file is split into for --workers
+PARTITION_SIZE = 8 * 1024 * 1024
+
+SQL_LOAD_FIELDS = ["timestamp", "table", "duration_seconds", "worker", "rows", "rows_per_second", "mb_per_second",
+                   "wal_mb"]
+
+def log_sql_load_performance(label, duration_seconds, rows=None, input_bytes=None, worker=None, wal_bytes=None):
+    """Append SQL load duration, and throughput when rows or bytes are known, to CSV log."""
     output_dir = os.path.join(PROJECT_ROOT, "reports", "performance_test_results")
     os.makedirs(output_dir, exist_ok=True)
 
     csv_path = os.path.join(output_dir, "performance_test_sql_load.csv")
 
     file_exists = os.path.isfile(csv_path)
-
-    with open(csv_path, "a", newline="") as f:
+    earlier_rows = []
+
+    # Logs written before the throughput columns existed are rewritten with them empty
+    if file_exists:
+        with open(csv_path, newline="") as f:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if header != SQL_LOAD_FIELDS:
+                earlier_rows = [row + [""] * (len(SQL_LOAD_FIELDS) - len(row)) for row in reader]
+                file_exists = False
+
+    with open(csv_path, "a" if file_exists else "w", newline="") as f:
         writer = csv.writer(f)
 
         # Write header once
         if not file_exists:
-            writer.writerow(["timestamp", "table", "duration_seconds"])
+            writer.writerow(SQL_LOAD_FIELDS)
+            writer.writerows(earlier_rows)
 
+        seconds = max(duration_seconds, 1e-9)
         writer.writerow([
             datetime.now().isoformat(),
             label,
-            f"{duration_seconds:.2f}"
+            f"{duration_seconds:.2f}",
+            "" if worker is None else worker,
+            "" if rows is None else rows,
+            "" if rows is None else f"{rows / seconds:.0f}",
+            "" if input_bytes is None else f"{input_bytes / (1024 * 1024) / seconds:.2f}",
+            "" if wal_bytes is None else f"{wal_bytes / (1024 * 1024):.2f}",
         ])
 
     print(f"✓ Logged SQL load performance to {csv_path}")
@@ -56,76 +106,279 @@ def connect_to_postgres():
         print(f"✗ Failed to connect to PostgreSQL: {e}")
         sys.exit(1)
 
-def load_sql_file(conn, sql_file, label):
-    """Load and execute SQL file with batched INSERTs for better performance"""
+def open_input(path, mode='rb', encoding=None, newline=None):
+    """Open a generated file for reading, decompressing .gz files on the fly"""
+    if path.endswith(".gz"):
+        return gzip.open(path, mode if 'b' in mode else 'rt', encoding=encoding, newline=newline)
+    return open(path, mode, encoding=encoding, newline=newline)
+
+class IteratorReader:
+    """File-like object whose read() is served from an iterator of byte strings"""
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.leftover = b''
+
+    def read(self, size=-1):
+        parts = [self.leftover]
+        length = len(self.leftover)
+        while size < 0 or length < size:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                break
+            parts.append(chunk)
+            length += len(chunk)
+
+        data = b''.join(parts)
+        if 0 <= size < len(data):
+            data, self.leftover = data[:size], data[size:]
+        else:
+            self.leftover = b''
+        return data
+
+class PartsReader:
+    """File-like reader over a sequence of files, read as one continuous stream"""
+
+    def __init__(self, paths, mode='rb', encoding=None, newline=None):
+        self.paths = list(paths)
+        self.mode = mode
+        self.encoding = encoding
+        self.newline = newline
+        self.current = None
+
+    def read(self, size=-1):
+        parts = []
+        while True:
+            if self.current is None:
+                if not self.paths:
+                    break
+                self.current = open_input(self.paths.pop(0), self.mode, self.encoding, self.newline)
+            data = self.current.read(size)
+            if not data:
+                self.current.close()
+                self.current = None
+                continue
+            if size is not None and size >= 0:
+                return data
+            parts.append(data)
+        return (b'' if 'b' in self.mode else '').join(parts)
+
+    def close(self):
+        if self.current is not None:
+            self.current.close()
+            self.current = None
+        self.paths = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+class TelemetryReader:
+    """Binary file wrapper that records each chunk COPY reads as one telemetry batch
+
+    A chunk's latency runs from handing it to the driver until the next
+    read, i.e. the time spent sending it to the server. Rows are counted
+    by newlines for text COPY and left at 0 for binary.
+    """
+
+    def __init__(self, f, telemetry, binary=False):
+        self.f = f
+        self.telemetry = telemetry
+        self.binary = binary
+        self.pending = None
+        self.handed_out = None
+
+    def read(self, size=-1):
+        if self.pending is not None:
+            self.telemetry.record(*self.pending, time.perf_counter() - self.handed_out)
+            self.pending = None
+        data = self.f.read(size)
+        if data:
+            self.pending = (0 if self.binary else data.count(b'\n'), len(data))
+        self.handed_out = time.perf_counter()
+        return data
+
+def copy_statement(table, binary=False):
+    """Return the COPY ... FROM STDIN statement for a generated table"""
+    copy_sql = f"COPY {table} ({', '.join(column_names(table))}) FROM STDIN"
+    if binary:
+        copy_sql += " WITH (FORMAT binary)"
+    return copy_sql
+
+def stream_size(input_files):
+    """Bytes the loader will read from input_files, or None for .gz inputs (decompressed size unknown)"""
+    if any(path.endswith(".gz") for path in input_files):
+        return None
+    return sum(os.path.getsize(path) for path in input_files)
+
+def find_input_files(path):
+    """Return [path], or the shard parts written by a parallel conversion
+
+    Falls back to the gzip-compressed output (path + ".gz") when there is no
+    uncompressed one.
+    """
+    for candidate in (path, path + ".gz"):
+        if os.path.exists(candidate):
+            return [candidate]
+        parts = shard_file_paths(candidate)
+        if parts:
+            return parts
+    return []
+
+def load_stage(kind, label):
+    """Checkpoint stage name of one loaded SQL file or COPY table"""
+    return f"load_{kind}_{label.lower()}"
+
+def reject_file_path(label):
+    """Return the reject file for statements of one SQL script the server refused"""
+    return os.path.join(PROJECT_ROOT, "sql", f"rejected_{label.lower()}.sql")
+
+class RejectFile:
+    """SQL script collecting refused statements, each preceded by its error as a comment
+
+    The file is only created once something is rejected. Fix the rows and
+    run it with psql to load them.
+    """
+
+    def __init__(self, path, append=False):
+        self.path = path
+        self.mode = 'a' if append else 'w'
+        self.file = None
+        self.count = 0
+        self.lock = threading.Lock()
+        if not append and os.path.exists(path):
+            os.remove(path)
+
+    def write(self, statement, error):
+        with self.lock:
+            if self.file is None:
+                self.file = open(self.path, self.mode, encoding='utf-8', newline='')
+            message = ' '.join(str(error).split())
+            self.file.write(f"-- {message}\n{statement}\n")
+            self.file.flush()
+            self.count += 1
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+def execute_batch(cursor, statements, rejects):
+    """Execute statements under a savepoint, bisecting a failing batch to isolate bad rows
+
+    On error the batch is rolled back to the savepoint and each half is
+    retried the same way. A single failing multi-row INSERT is split into
+    one statement per row, so only the offending rows end up in rejects and
+    everything else in the batch is kept.
+    """
+    cursor.execute("SAVEPOINT batch")
+    try:
+        cursor.execute('\n'.join(statements))
+    except psycopg2.Error as e:
+        cursor.execute("ROLLBACK TO SAVEPOINT batch")
+        cursor.execute("RELEASE SAVEPOINT batch")
+        if len(statements) > 1:
+            middle = len(statements) // 2
+            execute_batch(cursor, statements[:middle], rejects)
+            execute_batch(cursor, statements[middle:], rejects)
+            return
+        rows = split_insert_rows(statements[0])
+        if rows is not None and len(rows) > 1:
+            execute_batch(cursor, rows, rejects)
+        else:
+            rejects.write(statements[0], e)
+        return
+    cursor.execute("RELEASE SAVEPOINT batch")
+
+def iter_statement_batches(f, batch_size=STATEMENT_BATCH_SIZE):
+    """Yield lists of up to batch_size statements read lazily from a SQL script"""
+    statements = (stmt for stmt in iter_sql_statements(f) if stmt.upper() not in TRANSACTION_STATEMENTS)
+    while True:
+        batch = list(itertools.islice(statements, batch_size))
+        if not batch:
+            return
+        yield batch
+
+def load_sql_file(conn, sql_file, label, resume=False):
+    """Load and execute SQL file with batched INSERTs for better performance
+
+    Statements are split while the file is streamed, so only the current
+    batch is held in memory. Rows the server refuses (e.g. a foreign key
+    violation) are written to sql/rejected_<label>.sql and the load goes on.
+    The number of committed statements is checkpointed after every batch;
+    with resume, statements committed by an earlier run are skipped.
+    """
     try:
         print(f"\n[LOAD] Reading {label} SQL file: {sql_file}")
 
-        if not os.path.exists(sql_file):
+        input_files = find_input_files(sql_file)
+        if not input_files:
             print(f"✗ File not found: {sql_file}")
             return False
 
-        file_size_mb = os.path.getsize(sql_file) / (1024 * 1024)
-        print(f"  File size: {file_size_mb:.1f} MB")
+        stage = load_stage("sql", label)
+        settings = {"inputs": input_signature(input_files)}
+        state = load_checkpoint(stage, settings) if resume else None
+        if state and state["complete"]:
+            print(f"✓ {label} already loaded, skipping")
+            return True
+        statements_done = state["statements"] if state else 0
+
+        file_size_mb = sum(os.path.getsize(path) for path in input_files) / (1024 * 1024)
+        compressed = ", gzip" if input_files[0].endswith(".gz") else ""
+        print(f"  File size: {file_size_mb:.1f} MB ({len(input_files)} file(s){compressed})")
 
         print(f"[EXECUTE] Executing {label} SQL statements (batched mode)...")
         cursor = conn.cursor()
 
         start_time = datetime.now()
 
-        # Read SQL file and parse statements
-        with open(sql_file, 'r') as f:
-            sql_content = f.read()
-
-        # Split by semicolon while respecting quoted strings
-        # Remove transaction control statements
-        lines = sql_content.split('\n')
-        clean_lines = []
-        for line in lines:
-            line = line.strip()
-            if line and not line.startswith('--'):
-                # Skip transaction control statements
-                if line.upper() not in ('BEGIN TRANSACTION;', 'SET CONSTRAINTS ALL DEFERRED;', 'COMMIT;'):
-                    clean_lines.append(line)
-
-        # Rejoin and split by semicolon
-        full_content = ' '.join(clean_lines)
-
-        # Split statements by semicolon but keep them complete
-        raw_statements = full_content.split(';')
-        insert_statements = []
-        for stmt in raw_statements:
-            stmt = stmt.strip()
-            if stmt and stmt.upper() != '':
-                insert_statements.append(stmt + ';')
-
-        # Execute in batches of 100 for better performance
-        batch_size = 100
-        batch_count = (len(insert_statements) + batch_size - 1) // batch_size
-
-        print(f"  Total INSERT statements: {len(insert_statements):,}")
-        print(f"  Processing in {batch_count} batches of {batch_size}...")
-
-        for batch_num in range(0, len(insert_statements), batch_size):
-            batch = insert_statements[batch_num:batch_num + batch_size]
-            batch_sql = '; '.join(batch) + ';'
-
-            try:
-                cursor.execute(batch_sql)
-                conn.commit()
-
-                # Progress indicator
-                processed = min(batch_num + batch_size, len(insert_statements))
-                if processed % 1000 == 0 or processed == len(insert_statements):
-                    print(f"  ✓ Processed {processed:,}/{len(insert_statements):,} statements", end='\r')
-            except Exception as batch_error:
-                conn.rollback()
-                print(f"\n✗ Error in batch {batch_num // batch_size + 1}: {str(batch_error)[:100]}")
-                raise
-
+        print(f"  Processing in batches of {STATEMENT_BATCH_SIZE} statements...")
+        if statements_done:
+            print(f"[RESUME] Skipping {statements_done:,} statements committed by the previous run")
+
+        # Statements are split as the file streams in, respecting quotes, comments and dollar quoting
+        processed = 0
+        telemetry = LoadTelemetry(label, unit="statements", total_bytes=stream_size(input_files))
+        rejects = RejectFile(reject_file_path(label), append=statements_done > 0)
+        with rejects, PartsReader(input_files, 'r', encoding='utf-8', newline='') as f:
+            for batch_num, batch in enumerate(iter_statement_batches(f), 1):
+                processed += len(batch)
+                if processed <= statements_done:
+                    continue
+                # A batch straddling the checkpoint only runs its uncommitted statements
+                batch = batch[max(statements_done - processed + len(batch), 0):]
+
+                try:
+                    with telemetry.batch(len(batch), sum(len(statement) for statement in batch)):
+                        execute_batch(cursor, batch, rejects)
+                        conn.commit()
+                    save_checkpoint(stage, {
+                        "settings": settings,
+                        "statements": processed,
+                        "complete": False,
+                    })
+                except Exception as batch_error:
+                    conn.rollback()
+                    print(f"\n✗ Error in batch {batch_num}: {str(batch_error)[:100]}")
+                    raise
+
+        print(f"  ✓ Processed {processed:,} statements")
+        telemetry.finish()
+        if rejects.count:
+            print(f"  ✗ Rejected {rejects.count:,} row(s), written to {rejects.path}")
         end_time = datetime.now()
         duration = (end_time - start_time).total_seconds()
         log_sql_load_performance(label, duration)
+        save_checkpoint(stage, {"settings": settings, "statements": processed, "complete": True})
 
         print(f"\n✓ Successfully executed {label} SQL file")
         print(f"  Duration: {duration:.2f} seconds ({duration/60:.1f} minutes)")
@@ -137,6 +390,319 @@ def load_sql_file(conn, sql_file, label):
         conn.rollback()
         return False
 
+def load_copy_file(conn, copy_file, table, binary=False, resume=False):
+    """Stream a text or PGCOPY binary payload into a table with COPY ... FROM STDIN
+
+    A table is copied in one transaction, so the checkpoint only marks it
+    complete; with resume, completed tables are skipped.
+    """
+    try:
+        print(f"\n[LOAD] Reading {table} COPY file: {copy_file}")
+
+        input_files = find_input_files(copy_file)
+        if not input_files:
+            print(f"✗ File not found: {copy_file}")
+            return False
+
+        stage = load_stage("copy", table)
+        settings = {"inputs": input_signature(input_files), "binary": binary}
+        state = load_checkpoint(stage, settings) if resume else None
+        if state and state["complete"]:
+            print(f"✓ {table} already loaded, skipping")
+            return True
+
+        file_size_mb = sum(os.path.getsize(path) for path in input_files) / (1024 * 1024)
+        compressed = ", gzip" if input_files[0].endswith(".gz") else ""
+        print(f"  File size: {file_size_mb:.1f} MB ({len(input_files)} file(s){compressed})")
+
+        print(f"[EXECUTE] Copying {table} rows...")
+        cursor = conn.cursor()
+
+        start_time = datetime.now()
+
+        telemetry = LoadTelemetry(table, total_bytes=stream_size(input_files))
+        with PartsReader(input_files) as f:
+            cursor.copy_expert(copy_statement(table, binary), TelemetryReader(f, telemetry, binary),
+                               size=COPY_READ_SIZE)
+        row_count = cursor.rowcount
+        conn.commit()
+        telemetry.finish(rows=row_count)
+        save_checkpoint(stage, {"settings": settings, "rows": row_count, "complete": True})
+
+        end_time = datetime.now()
+        duration = (end_time - start_time).total_seconds()
+        log_sql_load_performance(table, duration)
+
+        print(f"✓ Copied {row_count:,} rows into {table}")
+        print(f"  Duration: {duration:.2f} seconds ({duration/60:.1f} minutes)")
+        cursor.close()
+        return True
+
+    except Exception as e:
+        print(f"✗ Error copying {table}: {str(e)[:200]}")
+        conn.rollback()
+        return False
+
+class WorkerConnections:
+    """One connection per loader thread, opened on first use and closed together"""
+
+    def __init__(self, config=POSTGRES_CONFIG):
+        self.config = config
+        self.local = threading.local()
+        self.numbers = itertools.count(1)
+        self.connections = []
+
+    def get(self):
+        """Return (worker number, connection) for the calling thread"""
+        if getattr(self.local, "conn", None) is None:
+            self.local.conn = psycopg2.connect(**self.config)
+            self.local.number = next(self.numbers)
+            self.connections.append(self.local.conn)
+        return self.local.number, self.local.conn
+
+    def close(self):
+        for conn in self.connections:
+            conn.close()
+        self.connections = []
+
+def copy_partitions(input_files, binary):
+    """Split a table's COPY input into partitions that load independently
+
+    A partition is [path, start, end, has_header, has_trailer]. Uncompressed
+    files are cut into PARTITION_SIZE ranges on row boundaries (text lines,
+    binary tuples); gzip files can't be seeked into, so each file or shard
+    part is one partition.
+    """
+    partitions = []
+    for index, path in enumerate(input_files):
+        if path.endswith(".gz") or os.path.getsize(path) == 0:
+            partitions.append([path, None, None, index == 0, index == len(input_files) - 1])
+        elif binary:
+            with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                partitions.extend([path, start, end, False, False] for start, end in tuple_ranges(buf, PARTITION_SIZE))
+        else:
+            size = os.path.getsize(path)
+            start = 0
+            with open(path, 'rb') as f:
+                while start < size:
+                    f.seek(min(start + PARTITION_SIZE, size))
+                    f.readline()
+                    partitions.append([path, start, f.tell(), False, False])
+                    start = f.tell()
+    return partitions
+
+def iter_partition_data(partition, binary):
+    """Yield the COPY payload of one partition, framed as a complete binary stream if needed"""
+    path, start, end, has_header, has_trailer = partition
+    if binary and not has_header:
+        yield PGCOPY_HEADER
+    with open_input(path) as f:
+        if start is None:
+            while chunk := f.read(COPY_READ_SIZE):
+                yield chunk
+        else:
+            f.seek(start)
+            remaining = end - start
+            while remaining > 0:
+                chunk = f.read(min(COPY_READ_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+    if binary and not has_trailer:
+        yield PGCOPY_TRAILER
+
+def partition_size(partition):
+    path, start, end = partition[:3]
+    return os.path.getsize(path) if start is None else end - start
+
+def load_copy_partition(connections, table, partition, binary):
+    """COPY one partition of a table in its own transaction on this thread's connection
+
+    Returns (worker, rows, bytes, seconds).
+    """
+    worker, conn = connections.get()
+    start_time = time.perf_counter()
+    cursor = conn.cursor()
+    try:
+        reader = IteratorReader(iter_partition_data(partition, binary))
+        cursor.copy_expert(copy_statement(table, binary), reader, size=COPY_READ_SIZE)
+        rows = cursor.rowcount
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    return worker, rows, partition_size(partition), time.perf_counter() - start_time
+
+def load_sql_partition(rejects, connections, label, partition, binary):
+    """Execute one SQL script or shard part in a single transaction on this thread's connection
+
+    Refused rows go to rejects[label]. Returns (worker, None, bytes,
+    seconds); row counts aren't tracked for scripts.
+    """
+    worker, conn = connections.get()
+    start_time = time.perf_counter()
+    cursor = conn.cursor()
+    try:
+        with open_input(partition[0], 'r', encoding='utf-8', newline='') as f:
+            for batch in iter_statement_batches(f):
+                execute_batch(cursor, batch, rejects[label])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    return worker, None, partition_size(partition), time.perf_counter() - start_time
+
+def load_parallel(groups, kind, workers, binary=False, resume=False, config=POSTGRES_CONFIG):
+    """Load groups of independent partitions on a pool of connections, respecting dependencies
+
+    groups maps a table (or SQL script label) to (partitions, dependencies).
+    A group's partitions are queued once every group it depends on has
+    finished, and then run side by side on whichever connections are free.
+    Each partition commits on its own and is checkpointed by index.
+    Worker connections are opened with config.
+    """
+    rejects = {}
+    if kind == "sql":
+        rejects = {name: RejectFile(reject_file_path(name), append=resume) for name in groups}
+        load_partition = partial(load_sql_partition, rejects)
+    else:
+        load_partition = load_copy_partition
+    states = {}
+    for name, (partitions, _) in groups.items():
+        stage = load_stage(f"{kind}_parallel", name)
+        settings = {"inputs": input_signature(sorted({p[0] for p in partitions})), "binary": binary,
+                    "partitions": partitions}
+        state = load_checkpoint(stage, settings) if resume else None
+        states[name] = state or {"settings": settings, "partitions_done": [], "complete": False}
+        if states[name]["partitions_done"]:
+            print(f"[RESUME] {name}: {len(states[name]['partitions_done']):,}/{len(partitions):,} "
+                  f"partitions already loaded")
+
+    connections = WorkerConnections(config)
+    worker_stats = {}
+    remaining = {name: set(range(len(partitions))) - set(states[name]["partitions_done"])
+                 for name, (partitions, _) in groups.items()}
+    started = {}
+    finished = {name for name in groups if not remaining[name]}
+    queued = set(finished)
+    futures = {}
+    telemetry = LoadTelemetry(f"{kind} load (parallel)", total_bytes=sum(
+        partition_size(groups[name][0][index]) for name in groups for index in remaining[name]))
+    start_time = time.perf_counter()
+
+    def record(future):
+        """Fold a finished partition into the worker stats and checkpoint it"""
+        name, index = futures.pop(future)
+        worker, rows, size, seconds = future.result()
+        stats = worker_stats.setdefault(worker, {"rows": 0, "bytes": 0, "seconds": 0.0, "partitions": 0})
+        stats["rows"] += rows or 0
+        stats["bytes"] += size
+        stats["seconds"] += seconds
+        stats["partitions"] += 1
+        telemetry.record(rows or 0, size, seconds)
+
+        state = states[name]
+        state["partitions_done"].append(index)
+        remaining[name].discard(index)
+        state["complete"] = not remaining[name]
+        save_checkpoint(load_stage(f"{kind}_parallel", name), state)
+
+        if not remaining[name]:
+            finished.add(name)
+            duration = time.perf_counter() - started[name]
+            print(f"✓ Loaded {name} ({len(groups[name][0]):,} partition(s), {duration:.2f} seconds)")
+            log_sql_load_performance(f"{name} (parallel)", duration)
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            try:
+                while True:
+                    for name, (partitions, dependencies) in groups.items():
+                        if name in queued or any(dep not in finished for dep in dependencies if dep in groups):
+                            continue
+                        queued.add(name)
+                        started[name] = time.perf_counter()
+                        print(f"[SCHEDULE] {name}: {len(remaining[name]):,} partition(s) queued")
+                        for index in sorted(remaining[name]):
+                            future = pool.submit(load_partition, connections, name, partitions[index], binary)
+                            futures[future] = (name, index)
+                    if not futures:
+                        break
+
+                    done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        record(future)
+            except Exception:
+                # Drop queued partitions, but checkpoint the ones still running that commit
+                for future in list(futures):
+                    if future.cancel():
+                        futures.pop(future)
+                for future in list(futures):
+                    try:
+                        record(future)
+                    except Exception:
+                        pass
+                raise
+    except Exception as e:
+        print(f"\n✗ Parallel load failed: {str(e)[:200]}")
+        print("  Committed partitions are checkpointed; rerun with --resume to load the rest")
+        return False
+    finally:
+        connections.close()
+        for reject_file in rejects.values():
+            reject_file.close()
+            if reject_file.count:
+                print(f"  ✗ Rejected {reject_file.count:,} row(s), written to {reject_file.path}")
+
+    duration = time.perf_counter() - start_time
+    telemetry.finish()
+    print(f"\n[WORKERS] {len(worker_stats)} connection(s), {duration:.2f} seconds wall time")
+    for worker, stats in sorted(worker_stats.items()):
+        seconds = max(stats["seconds"], 1e-9)
+        rows = stats["rows"] if kind != "sql" else None
+        rate = f"{stats['rows'] / seconds:,.0f} rows/s, " if rows is not None else ""
+        print(f"  Worker {worker}: {stats['partitions']:,} partition(s), {rate}"
+              f"{stats['bytes'] / (1024 * 1024) / seconds:.1f} MB/s over {stats['seconds']:.2f} s")
+        log_sql_load_performance(f"{kind} load worker", stats["seconds"], rows, stats["bytes"], worker)
+    log_sql_load_performance(f"{kind} load (parallel, {workers} workers)", duration,
+                             sum(s["rows"] for s in worker_stats.values()) if kind != "sql" else None,
+                             sum(s["bytes"] for s in worker_stats.values()))
+    return True
+
+def copy_groups(binary):
+    """Return {table: (partitions, dependencies)} for the COPY files of every generated table"""
+    groups = {}
+    for table in LOAD_ORDER:
+        input_files = find_input_files(copy_file_path(table, binary=binary))
+        if not input_files:
+            print(f"✗ File not found: {copy_file_path(table, binary=binary)}")
+            return None
+        groups[table] = (copy_partitions(input_files, binary), table_dependencies(table))
+    return groups
+
+def sql_groups():
+    """Return {label: (partitions, dependencies)} for the INSERT scripts
+
+    Only the shard parts of a parallel conversion can load side by side:
+    each holds whole patients with their admissions, stays and diagnoses.
+    A single script file is one partition.
+    """
+    patients_files = find_input_files(os.path.join(PROJECT_ROOT, "sql", "insert_scaled_patients.sql"))
+    noteevents_files = find_input_files(os.path.join(PROJECT_ROOT, "sql", "insert_scaled_noteevents.sql"))
+    if not patients_files or not noteevents_files:
+        print("✗ SQL files not found in sql/, run json_to_sql_converter.py first")
+        return None
+    return {
+        "Patients": ([[path, None, None, True, True] for path in patients_files], []),
+        # Notes reference patients and admissions
+        "NoteEvents": ([[path, None, None, True, True] for path in noteevents_files], ["Patients"]),
+    }
+
 def verify_data(conn):
     """Verify data was loaded correctly"""
     try:
@@ -175,29 +741,202 @@ def verify_data(conn):
         print(f"✗ Verification failed: {e}")
         return False
 
+def load_data(conn, args, ordered=True, config=POSTGRES_CONFIG):
+    """Load the generated files in the format chosen on the command line, returning success
+
+    With ordered=False (no foreign keys in place) the parallel loader starts
+    every table at once; its connections are opened with config.
+    """
+    if args.workers > 1:
+        binary = args.format == "binary"
+        kind = "sql" if args.format == "sql" else "copy"
+        print(f"\n[LOAD] Loading on {args.workers} connections")
+        groups = sql_groups() if kind == "sql" else copy_groups(binary)
+        if groups is None:
+            return False
+        if not ordered:
+            groups = {name: (partitions, []) for name, (partitions, _) in groups.items()}
+        return load_parallel(groups, kind, args.workers, binary, args.resume, config)
+
+    if args.format in ("copy", "binary"):
+        binary = args.format == "binary"
+        # Load tables in foreign key order
+        for table in LOAD_ORDER:
+            if not load_copy_file(conn, copy_file_path(table, binary=binary), table, binary, args.resume):
+                print(f"✗ Failed to load {table} data")
+                return False
+        return True
+
+    # Load patients SQL
+    patients_sql = os.path.join(PROJECT_ROOT, "sql", "insert_scaled_patients.sql")
+    if not load_sql_file(conn, patients_sql, "Patients", args.resume):
+        print("✗ Failed to load patient data")
+        return False
+
+    # Load noteevents SQL
+    noteevents_sql = os.path.join(PROJECT_ROOT, "sql", "insert_scaled_noteevents.sql")
+    if not load_sql_file(conn, noteevents_sql, "NoteEvents", args.resume):
+        print("✗ Failed to load noteevents data")
+        return False
+    return True
+
+def staged_load(conn, args):
+    """Load into UNLOGGED staging tables, then merge them into the real tables in one transaction"""
+    config = staging_config(POSTGRES_CONFIG)
+    timings = []
+    try:
+        start = time.perf_counter()
+        if args.resume and staging_tables_exist(conn, LOAD_ORDER):
+            print("\n[RESUME] Continuing into the staging tables left by the previous run")
+        else:
+            print("\n[STAGING] Creating staging tables...")
+            create_staging_tables(conn, LOAD_ORDER)
+            # Anything checkpointed went into staging tables that no longer exist
+            clear_checkpoints(load_stages())
+        timings.append(("create staging", time.perf_counter() - start))
+
+        start = time.perf_counter()
+        stage_conn = psycopg2.connect(**config)
+        try:
+            loaded = load_data(stage_conn, args, ordered=False, config=config)
+        finally:
+            stage_conn.close()
+        if not loaded:
+            print("  Staged rows are kept; rerun with --staging --resume to finish")
+            return False
+        timings.append(("load staging", time.perf_counter() - start))
+
+        print("\n[STAGING] Merging staging tables into the real tables in one transaction...")
+        start = time.perf_counter()
+        merge_staging_tables(conn, LOAD_ORDER)
+        timings.append(("merge", time.perf_counter() - start))
+
+        drop_staging_tables(conn, LOAD_ORDER)
+    except Exception as e:
+        conn.rollback()
+        print(f"✗ Staged load failed: {str(e)[:200]}")
+        print("  The real tables are unchanged; rerun with --staging --resume to retry")
+        return False
+
+    print("\n[STAGING] Phase timings:")
+    for phase, duration in timings:
+        print(f"  {phase:<15} {duration:8.2f} s")
+        log_sql_load_performance(f"staging {phase}", duration)
+    return True
+
+def bulk_load(conn, args, load):
+    """Drop constraints and indexes, run load(), rebuild them, and time each phase"""
+    timings = []
+    try:
+        print("\n[BULK] Dropping keys, foreign keys and indexes...")
+        start = time.perf_counter()
+        objects = drop_schema_objects(conn, LOAD_ORDER)
+        timings.append(("drop", time.perf_counter() - start))
+
+        start = time.perf_counter()
+        if not load():
+            print("  Constraints stay dropped; rerun with --bulk --resume to finish")
+            return False
+        timings.append(("load", time.perf_counter() - start))
+
+        print("\n[BULK] Rebuilding keys, foreign keys and indexes...")
+        timings.extend(rebuild_schema_objects(conn, POSTGRES_CONFIG, objects, LOAD_ORDER, max(args.workers, 1)))
+    except Exception as e:
+        conn.rollback()
+        print(f"✗ Bulk load failed: {str(e)[:200]}")
+        print("  The dropped definitions are kept in sql/checkpoint.json; rerun with --bulk --resume")
+        return False
+
+    print("\n[BULK] Phase timings:")
+    for phase, duration in timings:
+        print(f"  {phase:<13} {duration:8.2f} s")
+        log_sql_load_performance(f"bulk {phase}", duration)
+    print(f"  {'total':<13} {sum(d for _, d in timings):8.2f} s")
+    return True
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Load the generated scaled data into PostgreSQL")
+    parser.add_argument("--format", choices=["sql", "copy", "binary"], default="sql",
+                        help="sql: execute the INSERT scripts, copy/binary: COPY the text/binary files "
+                             "in sql/copy_scaled/ (default: %(default)s)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Skip work committed by an interrupted run, as recorded in sql/checkpoint.json")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Connections loading in parallel; tables start once the tables they "
+                             "reference are loaded (default: %(default)s)")
+    parser.add_argument("--staging", action="store_true",
+                        help="Load into UNLOGGED staging tables, then replace the contents of the real "
+                             "tables with them in one transaction")
+    parser.add_argument("--bulk", action="store_true",
+                        help="Drop keys, foreign keys and indexes before loading, then rebuild them "
+                             "on --workers connections, validate the foreign keys and ANALYZE")
+    return parser.parse_args()
+
+def load_stages():
+    """Checkpoint stage names of every load, serial or parallel"""
+    return ([load_stage(kind, table) for kind in ("copy", "copy_parallel") for table in LOAD_ORDER] +
+            [load_stage(kind, label) for kind in ("sql", "sql_parallel") for label in ("Patients", "NoteEvents")])
+
+def current_wal_lsn(conn):
+    """Return the server's current WAL write position"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT pg_current_wal_lsn()")
+    lsn = cursor.fetchone()[0]
+    conn.commit()
+    cursor.close()
+    return lsn
+
+def wal_bytes_since(conn, lsn):
+    """Return the bytes of WAL written since lsn, by every session on the server"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT pg_wal_lsn_diff(pg_current_wal_lsn(), %s)", (lsn,))
+    written = int(cursor.fetchone()[0])
+    conn.commit()
+    cursor.close()
+    return written
+
 def main():
+    args = parse_args()
+
     print("\n" + "=" * 70)
     print("SOEN363 PHASE 2 - LOAD SQL TO POSTGRESQL")
-    print("Execute generated SQL INSERT statements")
+    if args.format in ("copy", "binary"):
+        print(f"Stream generated {args.format} COPY files with COPY ... FROM STDIN")
+    else:
+        print("Execute generated SQL INSERT statements")
     print("=" * 70)
 
+    # Checked before the checkpoints are cleared, so the interrupted load can still resume
+    if saved_schema_objects() is not None and not (args.bulk and args.resume):
+        print("✗ Keys and foreign keys dropped by an interrupted --bulk load are still missing")
+        print("  Rerun with --bulk --resume to finish loading and rebuild them")
+        sys.exit(1)
+
+    if not args.resume:
+        clear_checkpoints(load_stages())
+
     # Connect
     conn = connect_to_postgres()
 
-    # Load patients SQL
-    patients_sql = os.path.join(PROJECT_ROOT, "sql", "insert_scaled_patients.sql")
-    if not load_sql_file(conn, patients_sql, "Patients"):
-        print("✗ Failed to load patient data")
-        conn.close()
-        sys.exit(1)
+    if args.staging:
+        load = partial(staged_load, conn, args)
+    else:
+        load = partial(load_data, conn, args, ordered=not args.bulk)
 
-    # Load noteevents SQL
-    noteevents_sql = os.path.join(PROJECT_ROOT, "sql", "insert_scaled_noteevents.sql")
-    if not load_sql_file(conn, noteevents_sql, "NoteEvents"):
-        print("✗ Failed to load noteevents data")
+    wal_start = current_wal_lsn(conn)
+    start_time = time.perf_counter()
+    loaded = bulk_load(conn, args, load) if args.bulk else load()
+    if not loaded:
         conn.close()
         sys.exit(1)
 
+    duration = time.perf_counter() - start_time
+    wal_written = wal_bytes_since(conn, wal_start)
+    modes = [args.format, f"{args.workers} worker(s)"] + [m for m in ("staging", "bulk") if getattr(args, m)]
+    print(f"\n[WAL] {wal_written / (1024 * 1024):.1f} MB of WAL written in {duration:.2f} seconds "
+          f"({', '.join(modes)})")
+    log_sql_load_performance(f"total ({', '.join(modes)})", duration, wal_bytes=wal_written)
+
     # Verify
     if verify_data(conn):
         print("\n" + "=" * 70)
@@ -0,0 +1,164 @@
+"""
+SOEN363 Phase 2 - Load Telemetry
+Live throughput, ETA and batch latency percentiles for the loaders, plus a
+per-batch time series CSV
+
+A loader creates one LoadTelemetry per table or collection and records every
+batch it sends (rows, bytes and how long the server took). Every few seconds
+a progress line shows rows/s, MB/s, the ETA and p50/p95/p99 batch latency;
+finish() prints the totals. Each batch is also appended to
+reports/performance_test_results/performance_test_load_batches.csv, so a
+throughput cliff part way through a load shows up when the series is plotted.
+"""
+
+import csv
+import os
+import threading
+import time
+from datetime import datetime
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BATCHES_CSV = os.path.join(PROJECT_ROOT, "reports", "performance_test_results", "performance_test_load_batches.csv")
+BATCH_FIELDS = ["run", "loader", "batch", "timestamp", "elapsed_seconds", "rows", "bytes", "latency_ms",
+                "rows_per_second", "mb_per_second"]
+
+# Seconds between live progress lines
+REPORT_INTERVAL = 5.0
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(int(fraction * len(sorted_values)), len(sorted_values) - 1)]
+
+def format_eta(seconds):
+    if seconds is None:
+        return "?"
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"{minutes // 60}:{minutes % 60:02d}:{seconds:02d}" if minutes >= 60 else f"{minutes}:{seconds:02d}"
+
+class LoadTelemetry:
+    """Throughput and latency of one load, fed one batch at a time
+
+    unit names what rows counts (rows, documents, statements). The ETA is
+    based on total_bytes when given, else on total_rows. Batches may be
+    recorded from several threads.
+    """
+
+    def __init__(self, loader, unit="rows", total_rows=None, total_bytes=None, csv_path=BATCHES_CSV):
+        self.loader = loader
+        self.unit = unit
+        self.total_rows = total_rows
+        self.total_bytes = total_bytes
+        self.csv_path = csv_path
+        self.run = datetime.now().isoformat(timespec="seconds")
+        self.rows = 0
+        self.bytes = 0
+        self.latencies = []
+        self.lock = threading.Lock()
+        self.start = time.perf_counter()
+        self.last_report = self.start
+        self.file = None
+        self.writer = None
+
+    def record(self, rows, nbytes, seconds):
+        """Record one batch of rows and bytes that took seconds to load"""
+        with self.lock:
+            self.rows += rows
+            self.bytes += nbytes
+            self.latencies.append(seconds)
+            now = time.perf_counter()
+            self.write_batch(rows, nbytes, seconds, now - self.start)
+            if now - self.last_report >= REPORT_INTERVAL:
+                self.last_report = now
+                print(f"  [{self.loader}] {self.progress_line(now - self.start)}")
+
+    def batch(self, rows, nbytes=0):
+        """Context manager timing one batch: with telemetry.batch(len(docs)): insert(docs)"""
+        return TimedBatch(self, rows, nbytes)
+
+    def write_batch(self, rows, nbytes, seconds, elapsed):
+        if self.writer is None:
+            os.makedirs(os.path.dirname(self.csv_path), exist_ok=True)
+            file_exists = os.path.isfile(self.csv_path)
+            self.file = open(self.csv_path, "a", newline="")
+            self.writer = csv.writer(self.file)
+            if not file_exists:
+                self.writer.writerow(BATCH_FIELDS)
+        seconds_or_tiny = max(seconds, 1e-9)
+        self.writer.writerow([
+            self.run,
+            self.loader,
+            len(self.latencies),
+            datetime.now().isoformat(),
+            f"{elapsed:.3f}",
+            rows,
+            nbytes,
+            f"{seconds * 1000:.2f}",
+            f"{rows / seconds_or_tiny:.0f}",
+            f"{nbytes / (1024 * 1024) / seconds_or_tiny:.2f}",
+        ])
+
+    def eta(self, elapsed):
+        """Seconds left at the current average rate, or None if the total is unknown"""
+        if self.total_bytes and self.bytes:
+            return max(self.total_bytes - self.bytes, 0) * elapsed / self.bytes
+        if self.total_rows and self.rows:
+            return max(self.total_rows - self.rows, 0) * elapsed / self.rows
+        return None
+
+    def latency_line(self):
+        latencies = sorted(self.latencies)
+        return (f"batch p50 {percentile(latencies, 0.50) * 1000:.0f} ms, "
+                f"p95 {percentile(latencies, 0.95) * 1000:.0f} ms, "
+                f"p99 {percentile(latencies, 0.99) * 1000:.0f} ms")
+
+    def progress_line(self, elapsed, eta=True):
+        seconds = max(elapsed, 1e-9)
+        parts = []
+        # Loaders that can't count rows or bytes cheaply leave them at 0
+        if self.rows or self.total_rows:
+            done = f"{self.rows:,}" + (f"/{self.total_rows:,}" if self.total_rows else "")
+            parts.append(f"{done} {self.unit}, {self.rows / seconds:,.0f} {self.unit}/s")
+        if self.bytes:
+            parts.append(f"{self.bytes / (1024 * 1024):,.1f} MB, {self.bytes / (1024 * 1024) / seconds:.1f} MB/s")
+        if eta:
+            parts.append(f"ETA {format_eta(self.eta(elapsed))}")
+        parts.append(self.latency_line())
+        return ", ".join(parts)
+
+    def finish(self, rows=None):
+        """Print the totals and close the batch CSV; rows overrides the recorded count (e.g. from COPY)
+
+        Returns {"rows", "bytes", "seconds", "p50", "p95", "p99"}.
+        """
+        with self.lock:
+            if rows is not None:
+                self.rows = rows
+            elapsed = time.perf_counter() - self.start
+            if self.file is not None:
+                self.file.close()
+                self.file = self.writer = None
+            latencies = sorted(self.latencies)
+            print(f"  [{self.loader}] {len(latencies):,} batch(es) in {elapsed:.2f} s: "
+                  f"{self.progress_line(elapsed, eta=False)}")
+            return {"rows": self.rows, "bytes": self.bytes, "seconds": elapsed,
+                    "p50": percentile(latencies, 0.50), "p95": percentile(latencies, 0.95),
+                    "p99": percentile(latencies, 0.99)}
+
+class TimedBatch:
+    """Times the body of a with block and records it as one batch"""
+
+    def __init__(self, telemetry, rows, nbytes):
+        self.telemetry = telemetry
+        self.rows = rows
+        self.nbytes = nbytes
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.telemetry.record(self.rows, self.nbytes, time.perf_counter() - self.start)
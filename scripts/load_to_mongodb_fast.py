@@ -3,25 +3,29 @@ SOEN363 Phase 2 - Fast MongoDB Loading with Streaming
 Extract from PostgreSQL and load directly with batch processing
 """
 
+import bson
 import psycopg2
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
 from pymongo import MongoClient
-from datetime import datetime, date
-from decimal import Decimal
+from datetime import datetime
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import argparse
+import itertools
+import math
+import operator
 import os
 import sys
+import time
 import csv
 
-def convert_to_mongo_compatible(obj):
-    """Convert Python objects to MongoDB-compatible types"""
-    if isinstance(obj, Decimal):
-        return float(obj)
-    elif isinstance(obj, date):
-        return obj.isoformat()
-    elif isinstance(obj, dict):
-        return {k: convert_to_mongo_compatible(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [convert_to_mongo_compatible(v) for v in obj]
-    return obj
+from insert_pipeline import INSERT_THREADS, AdaptiveBatcher, InsertPipeline
+from load_telemetry import LoadTelemetry
+
+def encode_document(doc):
+    """BSON-encode a built document once, so its size is known and pymongo sends the bytes as they are"""
+    return RawBSONDocument(bson.encode(doc))
 
 POSTGRES_CONFIG = {
     "host": "localhost",
@@ -52,12 +56,14 @@ def connect_postgres():
         print(f"✗ Failed to connect: {e}")
         sys.exit(1)
 
+def mongo_uri():
+    return f"mongodb://{MONGO_CONFIG['username']}:{MONGO_CONFIG['password']}@{MONGO_CONFIG['host']}:{MONGO_CONFIG['port']}/"
+
 def connect_mongodb():
     """Connect to MongoDB"""
     try:
         print("[MONGODB] Connecting to MongoDB...")
-        uri = f"mongodb://{MONGO_CONFIG['username']}:{MONGO_CONFIG['password']}@{MONGO_CONFIG['host']}:{MONGO_CONFIG['port']}/"
-        client = MongoClient(uri, serverSelectionTimeoutMS=5000)
+        client = MongoClient(mongo_uri(), serverSelectionTimeoutMS=5000)
         db = client[MONGO_CONFIG['database']]
         print("✓ Connected to MongoDB")
         return client, db
@@ -65,198 +71,429 @@ def connect_mongodb():
         print(f"✗ Failed to connect: {e}")
         sys.exit(1)
 
-def load_patients_streaming(postgres_conn, mongo_db):
-    """Load patients with streaming approach - build and insert in batches"""
+# Rows each server-side cursor fetches per round trip (--itersize): bounds the rows
+# held in client memory per scan
+CURSOR_ITERSIZE = 5000
+
+# Every stream is sorted by the patient that owns it, then by admission, so one pass
+# over all four builds each patient document. Stays and diagnoses are keyed to the
+# subject of their admission, and diagnoses carry their ICD9 titles from a join.
+# {where} is empty, or limits the owning subject_id to a range.
+PATIENT_STREAMS = {
+    "patients": ("SELECT * FROM patients {where} ORDER BY subject_id", "subject_id"),
+    "admissions": ("SELECT * FROM admissions {where} ORDER BY subject_id, hadm_id", "subject_id"),
+    "icustays": ("""
+        SELECT a.subject_id AS admission_subject_id, i.*
+        FROM icustays i JOIN admissions a ON a.hadm_id = i.hadm_id
+        {where}
+        ORDER BY a.subject_id, i.hadm_id, i.row_id
+    """, "a.subject_id"),
+    "diagnoses_icd": ("""
+        SELECT a.subject_id AS admission_subject_id, d.*, t.short_title, t.long_title
+        FROM diagnoses_icd d
+        JOIN admissions a ON a.hadm_id = d.hadm_id
+        LEFT JOIN d_icd_diagnoses t ON t.icd9_code = d.icd9_code
+        {where}
+        ORDER BY a.subject_id, d.hadm_id, d.row_id
+    """, "a.subject_id"),
+}
+
+class SortedGroups:
+    """Runs of rows sharing a key, taken in ascending key order from a sorted stream"""
+
+    def __init__(self, rows, key):
+        self.groups = itertools.groupby(rows, key)
+        self.advance()
+
+    def advance(self):
+        self.key, group = next(self.groups, (None, None))
+        self.rows = list(group) if group is not None else []
+
+    def take(self, key):
+        """Return the rows for key, or [] if the stream has none; smaller keys are skipped"""
+        while self.key is not None and self.key < key:
+            self.advance()
+        if self.key != key:
+            return []
+        rows = self.rows
+        self.advance()
+        return rows
+
+def open_stream(cursor, query, params=None):
+    """Run query on a named (server-side) cursor and return (row iterator, cursor.description)"""
+    cursor.execute(query, params)
+    # A named cursor only has a description once the first rows arrive
+    first = cursor.fetchmany(1)
+    return itertools.chain(first, cursor), cursor.description
+
+def stream_rows(cursor, name, subject_range=None):
+    """Run one of PATIENT_STREAMS on a named (server-side) cursor
+
+    Returns (row iterator, {column: index}, cursor.description). subject_range
+    (first, last) limits the rows to those patients.
+    """
+    query, subject_column = PATIENT_STREAMS[name]
+    if subject_range is None:
+        rows, description = open_stream(cursor, query.format(where=""))
+    else:
+        rows, description = open_stream(cursor, query.format(where=f"WHERE {subject_column} BETWEEN %s AND %s"),
+                                        subject_range)
+    col_idx = {desc[0]: i for i, desc in enumerate(description)}
+    return rows, col_idx, description
+
+# How dates and timestamps are stored: "string" as ISO strings, "native" as BSON dates,
+# which are 8 bytes, compare as dates in range queries and work with $year, $subtract, ...
+DATE_MODES = ["string", "native"]
+
+# PostgreSQL type codes (cursor.description) of values MongoDB can't store as they come:
+# numeric arrives as Decimal and is stored as a double; date (no BSON equivalent) and
+# timestamp/timestamptz follow the date mode
+NUMERIC_OID = 1700
+DATE_OID = 1082
+TIMESTAMP_OIDS = {1114, 1184}
+
+def date_to_datetime(value):
+    """BSON has no date-only type, so a date is stored as midnight UTC of that day"""
+    return datetime(value.year, value.month, value.day)
+
+def column_converter(type_code, dates="string"):
+    """Return the function converting a column's non-null values, or None if they are stored as they are"""
+    if type_code == NUMERIC_OID:
+        return float
+    if dates == "native":
+        # pymongo encodes datetimes as BSON dates already
+        return date_to_datetime if type_code == DATE_OID else None
+    if type_code == DATE_OID or type_code in TIMESTAMP_OIDS:
+        return operator.methodcaller('isoformat')
+    return None
+
+class RowConverter:
+    """Turns the rows of one query into MongoDB-compatible dicts, leaving out the columns in skip
+
+    dates is one of DATE_MODES.
+
+    The converter for each column is picked once from cursor.description, so
+    a row costs one tuple lookup plus a call per non-null numeric or date
+    value, instead of a type check on every value of the finished document.
+    """
+
+    def __init__(self, description, skip=(), dates="string"):
+        columns = [(i, desc[0], column_converter(desc[1], dates))
+                   for i, desc in enumerate(description) if desc[0] not in skip]
+        self.names = tuple(name for _, name, _ in columns)
+        indexes = [i for i, _, _ in columns]
+        # itemgetter of a single index returns the value rather than a tuple
+        self.values = operator.itemgetter(*indexes) if len(indexes) > 1 else lambda row: tuple(row[i] for i in indexes)
+        self.converters = [(position, convert) for position, (_, _, convert) in enumerate(columns)
+                           if convert is not None]
+
+    def __call__(self, row):
+        values = self.values(row)
+        if self.converters:
+            values = list(values)
+            for position, convert in self.converters:
+                if values[position] is not None:
+                    values[position] = convert(values[position])
+        return dict(zip(self.names, values))
+
+def iter_patient_documents(postgres_conn, subject_range=None, dates="string", itersize=CURSOR_ITERSIZE):
+    """Yield each patient document, merge-joining the sorted table streams in one pass
+
+    Only the current patient's rows (plus one cursor page per table) are
+    held in memory, whatever the size of the tables. subject_range (first,
+    last) limits the documents to those patients; dates is one of DATE_MODES;
+    itersize is the rows fetched per round trip on each cursor.
+    """
+    cursors = {}
+    for name in PATIENT_STREAMS:
+        cursors[name] = postgres_conn.cursor(name=f"{name}_stream")
+        cursors[name].itersize = itersize
+    try:
+        patients, patient_col_idx, patient_desc = stream_rows(cursors["patients"], "patients", subject_range)
+        admissions_rows, admission_col_idx, admission_desc = stream_rows(cursors["admissions"], "admissions",
+                                                                         subject_range)
+        icustay_rows, icustay_col_idx, icustay_desc = stream_rows(cursors["icustays"], "icustays", subject_range)
+        diagnose_rows, diagnose_col_idx, diagnose_desc = stream_rows(cursors["diagnoses_icd"], "diagnoses_icd",
+                                                                     subject_range)
+
+        admissions = SortedGroups(admissions_rows, operator.itemgetter(admission_col_idx['subject_id']))
+        icustays = SortedGroups(icustay_rows, operator.itemgetter(icustay_col_idx['admission_subject_id'],
+                                                                  icustay_col_idx['hadm_id']))
+        diagnoses = SortedGroups(diagnose_rows, operator.itemgetter(diagnose_col_idx['admission_subject_id'],
+                                                                    diagnose_col_idx['hadm_id']))
+        child_columns = {'admission_subject_id', 'row_id', 'subject_id', 'hadm_id'}
+        patient_document = RowConverter(patient_desc, {'row_id'}, dates)
+        admission_document = RowConverter(admission_desc, {'row_id', 'subject_id'}, dates)
+        icustay_document = RowConverter(icustay_desc, child_columns, dates)
+        diagnose_document = RowConverter(diagnose_desc, child_columns, dates)
+        subject_id_of = operator.itemgetter(patient_col_idx['subject_id'])
+        hadm_id_of = operator.itemgetter(admission_col_idx['hadm_id'])
+
+        for patient in patients:
+            subject_id = subject_id_of(patient)
+            patient_doc = {"_id": subject_id}
+            patient_doc.update(patient_document(patient))
+
+            embedded_admissions = []
+            for adm in admissions.take(subject_id):
+                hadm_id = hadm_id_of(adm)
+                adm_doc = admission_document(adm)
+                adm_doc['icustays'] = [icustay_document(icu) for icu in icustays.take((subject_id, hadm_id))]
+                adm_doc['diagnoses_icd'] = [diagnose_document(diag)
+                                            for diag in diagnoses.take((subject_id, hadm_id))]
+                embedded_admissions.append(adm_doc)
+
+            patient_doc['admissions'] = embedded_admissions
+            yield patient_doc
+    finally:
+        for cursor in cursors.values():
+            cursor.close()
+
+def load_patients_streaming(postgres_conn, mongo_db, inserters=INSERT_THREADS, dates="string",
+                            itersize=CURSOR_ITERSIZE):
+    """Load patients with streaming approach - build batches while inserter threads write earlier ones"""
     print("\n[LOAD] Loading patients with streaming approach...")
 
     cursor = postgres_conn.cursor()
-    batch_size = 100
-    batch_docs = []
-    total_inserted = 0
+    batcher = AdaptiveBatcher("patients")
 
     try:
-        # Get all patients with their basic info
-        cursor.execute("SELECT * FROM patients ORDER BY subject_id")
-        patients = cursor.fetchall()
-        patient_cols = [desc[0] for desc in cursor.description]
-        patient_col_idx = {col: i for i, col in enumerate(patient_cols)}
-        subject_idx = patient_col_idx['subject_id']
-
-        print(f"  Processing {len(patients)} patients...")
-
-        # Get admissions
-        cursor.execute("SELECT * FROM admissions ORDER BY subject_id, hadm_id")
-        admissions = cursor.fetchall()
-        admission_cols = [desc[0] for desc in cursor.description]
-        admission_col_idx = {col: i for i, col in enumerate(admission_cols)}
-        adm_subject_idx = admission_col_idx['subject_id']
-        adm_hadm_idx = admission_col_idx['hadm_id']
-
-        # Get icustays
-        cursor.execute("SELECT * FROM icustays ORDER BY hadm_id")
-        icustays = cursor.fetchall()
-        icustay_cols = [desc[0] for desc in cursor.description]
-        icustay_col_idx = {col: i for i, col in enumerate(icustay_cols)}
-        icu_hadm_idx = icustay_col_idx['hadm_id']
-
-        # Get diagnoses
-        cursor.execute("SELECT * FROM diagnoses_icd ORDER BY hadm_id")
-        diagnoses = cursor.fetchall()
-        diagnose_cols = [desc[0] for desc in cursor.description]
-        diagnose_col_idx = {col: i for i, col in enumerate(diagnose_cols)}
-        diag_hadm_idx = diagnose_col_idx['hadm_id']
-
-        # Get ICD9 titles
-        cursor.execute("SELECT * FROM d_icd_diagnoses")
-        icd_titles = cursor.fetchall()
-        title_cols = [desc[0] for desc in cursor.description]
-        title_idx = {col: i for i, col in enumerate(title_cols)}
-
-        titles_by_code = {}
-        for row in icd_titles:
-            code = row[title_idx['icd9_code']]
-            titles_by_code[code] = {
-                "short_title": row[title_idx['short_title']],
-                "long_title": row[title_idx['long_title']]
-            }
-
-        # Index by hadm_id for fast lookup
-        admissions_by_subject = {}
-        for adm in admissions:
-            subj_id = adm[adm_subject_idx]
-            if subj_id not in admissions_by_subject:
-                admissions_by_subject[subj_id] = []
-            admissions_by_subject[subj_id].append(adm)
-
-        icustays_by_hadm = {}
-        for icu in icustays:
-            hadm_id = icu[icu_hadm_idx]
-            if hadm_id not in icustays_by_hadm:
-                icustays_by_hadm[hadm_id] = []
-            icustays_by_hadm[hadm_id].append(icu)
-
-        diagnoses_by_hadm = {}
-        for diag in diagnoses:
-            hadm_id = diag[diag_hadm_idx]
-            if hadm_id not in diagnoses_by_hadm:
-                diagnoses_by_hadm[hadm_id] = []
-            diagnoses_by_hadm[hadm_id].append(diag)
+        cursor.execute("SELECT COUNT(*) FROM patients")
+        patient_count = cursor.fetchone()[0]
+        cursor.close()
+
+        print(f"  Processing {patient_count} patients...")
+        telemetry = LoadTelemetry("patients", unit="documents", total_rows=patient_count)
 
         # Process patients in batches
-        for i, patient in enumerate(patients):
-            subject_id = patient[subject_idx]
+        with InsertPipeline(mongo_db['patients'], telemetry, inserters, on_insert=batcher.observe) as pipeline:
+            for i, patient_doc in enumerate(iter_patient_documents(postgres_conn, dates=dates, itersize=itersize)):
+                # Queue batch when ready
+                batch = batcher.add(encode_document(patient_doc))
+                if batch:
+                    pipeline.put(*batch)
+                if (i + 1) % 10000 == 0:
+                    print(f"  ✓ Processed {i + 1}/{patient_count} patients ({pipeline.inserted} inserted)")
 
-            # Build patient document
-            patient_doc = {"_id": subject_id}
-            for col, idx in patient_col_idx.items():
-                if col != 'row_id':
-                    patient_doc[col] = patient[idx]
+            # Queue remaining
+            batch = batcher.flush()
+            if batch:
+                pipeline.put(*batch)
+        total_inserted = pipeline.inserted
+        batcher.summary()
 
-            # Add admissions
-            patient_admissions = admissions_by_subject.get(subject_id, [])
-            embedded_admissions = []
+        print(f"  ✓ Inserted {total_inserted} patient documents")
+        telemetry.finish()
+        return total_inserted
 
-            for adm in patient_admissions:
-                hadm_id = adm[adm_hadm_idx]
-                adm_doc = {}
-                for col, idx in admission_col_idx.items():
-                    if col not in ['row_id', 'subject_id']:
-                        adm_doc[col] = adm[idx]
-
-                # Add icustays
-                adm_doc['icustays'] = []
-                for icu in icustays_by_hadm.get(hadm_id, []):
-                    icu_doc = {}
-                    for col, idx in icustay_col_idx.items():
-                        if col not in ['row_id', 'subject_id', 'hadm_id']:
-                            icu_doc[col] = icu[idx]
-                    adm_doc['icustays'].append(icu_doc)
-
-                # Add diagnoses
-                adm_doc['diagnoses_icd'] = []
-                for diag in diagnoses_by_hadm.get(hadm_id, []):
-                    diag_doc = {}
-                    for col, idx in diagnose_col_idx.items():
-                        if col not in ['row_id', 'subject_id', 'hadm_id']:
-                            diag_doc[col] = diag[idx]
-
-                    icd_code = diag[diagnose_col_idx['icd9_code']]         
-                    if icd_code in titles_by_code:
-                        diag_doc['short_title'] = titles_by_code[icd_code]['short_title']
-                        diag_doc['long_title'] = titles_by_code[icd_code]['long_title']
-                    else:
-                        diag_doc['short_title'] = None
-                        diag_doc['long_title'] = None
-                    adm_doc['diagnoses_icd'].append(diag_doc)
+    except Exception as e:
+        print(f"✗ Error loading patients: {e}")
+        cursor.close()
+        postgres_conn.rollback()
+        return 0
 
-                embedded_admissions.append(adm_doc)
+def key_ranges(postgres_conn, table, column, count):
+    """Split a table into up to count ranges of column holding about as many rows each
 
-            patient_doc['admissions'] = embedded_admissions
-            batch_docs.append(convert_to_mongo_compatible(patient_doc))
+    Returns [(first, last, rows)].
+    """
+    cursor = postgres_conn.cursor()
+    cursor.execute(f"""
+        SELECT min({column}), max({column}), count(*)
+        FROM (SELECT {column}, ntile(%s) OVER (ORDER BY {column}) AS part FROM {table}) p
+        GROUP BY part ORDER BY part
+    """, (count,))
+    ranges = cursor.fetchall()
+    postgres_conn.commit()
+    cursor.close()
+    return ranges
+
+def load_patient_range(subject_range, inserters=INSERT_THREADS, dates="string", itersize=CURSOR_ITERSIZE):
+    """Worker process: build and insert the patients of one subject_id range on its own connections
+
+    Returns (documents inserted, seconds).
+    """
+    start_time = time.perf_counter()
+    postgres_conn = psycopg2.connect(**POSTGRES_CONFIG)
+    mongo_client = MongoClient(mongo_uri(), serverSelectionTimeoutMS=5000)
+    collection = mongo_client[MONGO_CONFIG['database']]['patients']
+    batcher = AdaptiveBatcher(f"patients {subject_range[0]}-{subject_range[1]}")
+    try:
+        with InsertPipeline(collection, threads=inserters, on_insert=batcher.observe) as pipeline:
+            for patient_doc in iter_patient_documents(postgres_conn, subject_range, dates, itersize):
+                batch = batcher.add(encode_document(patient_doc))
+                if batch:
+                    pipeline.put(*batch)
+            batch = batcher.flush()
+            if batch:
+                pipeline.put(*batch)
+        batcher.summary()
+    finally:
+        postgres_conn.close()
+        mongo_client.close()
+    return pipeline.inserted, time.perf_counter() - start_time
 
-            # Insert batch when ready
-            if len(batch_docs) >= batch_size:
-                mongo_db['patients'].insert_many(batch_docs, ordered=False)
-                total_inserted += len(batch_docs)
-                if (i + 1) % 10000 == 0:
-                    print(f"  ✓ Processed {i + 1}/{len(patients)} patients ({total_inserted} inserted)")
-                batch_docs = []
+def load_patients_parallel(postgres_conn, workers, inserters=INSERT_THREADS, dates="string",
+                           itersize=CURSOR_ITERSIZE):
+    """Load patients on worker processes, each building and inserting one subject_id range"""
+    print(f"\n[LOAD] Loading patients on {workers} worker processes...")
 
-        # Insert remaining
-        if batch_docs:
-            mongo_db['patients'].insert_many(batch_docs, ordered=False)
-            total_inserted += len(batch_docs)
+    try:
+        ranges = key_ranges(postgres_conn, "patients", "subject_id", workers)
+        telemetry = LoadTelemetry("patients (parallel)", unit="documents",
+                                  total_rows=sum(patients for _, _, patients in ranges))
+        total_inserted = 0
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(load_patient_range, (first, last), inserters, dates, itersize): (first, last)
+                       for first, last, _ in ranges}
+            for future in as_completed(futures):
+                first, last = futures[future]
+                inserted, seconds = future.result()
+                telemetry.record(inserted, 0, seconds)
+                total_inserted += inserted
+                print(f"  ✓ subject_id {first}-{last}: {inserted} documents in {seconds:.2f} seconds "
+                      f"({inserted / max(seconds, 1e-9):,.0f} documents/s)")
 
         print(f"  ✓ Inserted {total_inserted} patient documents")
-        cursor.close()
+        telemetry.finish()
         return total_inserted
 
     except Exception as e:
         print(f"✗ Error loading patients: {e}")
+        return 0
+
+# Rows each encoder process turns into documents per task
+ENCODE_CHUNK_ROWS = 2000
+
+# Splits encoded batches back into documents without decoding them
+RAW_CODEC_OPTIONS = CodecOptions(document_class=RawBSONDocument)
+
+# Connection held by each encoder process for the lifetime of the pool
+worker_conn = None
+
+def open_worker_connection():
+    """Pool initializer: open the connection this encoder reads its ranges on"""
+    global worker_conn
+    worker_conn = psycopg2.connect(**POSTGRES_CONFIG)
+
+def encode_patient_range(subject_range, dates="string"):
+    """Encoder process: build the patients of one subject_id range and return them as concatenated BSON"""
+    try:
+        return b''.join(bson.encode(doc) for doc in iter_patient_documents(worker_conn, subject_range, dates))
+    finally:
+        worker_conn.commit()
+
+def encode_note_range(row_range, dates="string"):
+    """Encoder process: return the noteevents of one row_id range as concatenated BSON"""
+    cursor = worker_conn.cursor()
+    try:
+        cursor.execute("SELECT * FROM noteevents WHERE row_id BETWEEN %s AND %s ORDER BY subject_id", row_range)
+        note_document = RowConverter(cursor.description, {'row_id'}, dates)
+        return b''.join(bson.encode(note_document(row)) for row in cursor)
+    finally:
+        cursor.close()
+        worker_conn.commit()
+
+def load_encoded(postgres_conn, mongo_db, collection, table, column, encode, encoders, inserters=INSERT_THREADS,
+                 dates="string"):
+    """Load a collection from BSON built by encoder processes, one range of column per task
+
+    The encoders read, convert and encode; this process only slices their
+    bytes into RawBSONDocuments and feeds the insert pipeline. At most two
+    tasks per encoder are in flight, and results are taken in order.
+    """
+    print(f"\n[LOAD] Loading {collection}, encoded on {encoders} processes...")
+
+    cursor = postgres_conn.cursor()
+    batcher = AdaptiveBatcher(collection)
+
+    try:
+        cursor.execute(f"SELECT COUNT(*) FROM {table}")
+        row_count = cursor.fetchone()[0]
         cursor.close()
+        ranges = iter(key_ranges(postgres_conn, table, column, max(math.ceil(row_count / ENCODE_CHUNK_ROWS), 1)))
+        telemetry = LoadTelemetry(collection, unit="documents", total_rows=row_count)
+
+        with ProcessPoolExecutor(max_workers=encoders, initializer=open_worker_connection) as pool, \
+                InsertPipeline(mongo_db[collection], telemetry, inserters, on_insert=batcher.observe) as pipeline:
+            pending = deque(pool.submit(encode, (first, last), dates)
+                            for first, last, _ in itertools.islice(ranges, encoders * 2))
+            while pending:
+                encoded = pending.popleft().result()
+                for first, last, _ in itertools.islice(ranges, 1):
+                    pending.append(pool.submit(encode, (first, last), dates))
+                for doc in bson.decode_all(encoded, RAW_CODEC_OPTIONS):
+                    batch = batcher.add(doc)
+                    if batch:
+                        pipeline.put(*batch)
+
+            batch = batcher.flush()
+            if batch:
+                pipeline.put(*batch)
+        total_inserted = pipeline.inserted
+        batcher.summary()
+
+        print(f"  ✓ Inserted {total_inserted} {collection} documents")
+        telemetry.finish()
+        return total_inserted
+
+    except Exception as e:
+        print(f"✗ Error loading {collection}: {e}")
+        cursor.close()
+        postgres_conn.rollback()
         return 0
 
-def load_noteevents_streaming(postgres_conn, mongo_db):
-    """Load noteevents with streaming"""
+def load_noteevents_streaming(postgres_conn, mongo_db, inserters=INSERT_THREADS, dates="string",
+                              itersize=CURSOR_ITERSIZE):
+    """Load noteevents with streaming, inserting on pipeline threads
+
+    The rows come through a named (server-side) cursor itersize rows at a
+    time, so the note text is never all in client memory and inserts start
+    after the first page.
+    """
     print("\n[LOAD] Loading noteevents...")
 
     cursor = postgres_conn.cursor()
-    batch_size = 500
-    batch_docs = []
-    total_inserted = 0
+    batcher = AdaptiveBatcher("noteevents")
 
     try:
-        cursor.execute("SELECT * FROM noteevents ORDER BY subject_id")
-        cols = [desc[0] for desc in cursor.description]
-        col_idx = {col: i for i, col in enumerate(cols)}
+        cursor.execute("SELECT COUNT(*) FROM noteevents")
+        note_count = cursor.fetchone()[0]
+        cursor.close()
+
+        cursor = postgres_conn.cursor(name="noteevents_stream")
+        cursor.itersize = itersize
+        note_rows, description = open_stream(cursor, "SELECT * FROM noteevents ORDER BY subject_id")
+        note_document = RowConverter(description, {'row_id'}, dates)
+        telemetry = LoadTelemetry("noteevents", unit="documents", total_rows=note_count)
 
         row_count = 0
-        for note_row in cursor:
-            row_count += 1
-            note_doc = {}
-            for col, idx in col_idx.items():
-                if col != 'row_id':
-                    note_doc[col] = note_row[idx]
-            batch_docs.append(convert_to_mongo_compatible(note_doc))
-
-            if len(batch_docs) >= batch_size:
-                mongo_db['noteevents'].insert_many(batch_docs, ordered=False)
-                total_inserted += len(batch_docs)
+        with InsertPipeline(mongo_db['noteevents'], telemetry, inserters, on_insert=batcher.observe) as pipeline:
+            for note_row in note_rows:
+                row_count += 1
+                batch = batcher.add(encode_document(note_document(note_row)))
+                if batch:
+                    pipeline.put(*batch)
                 if row_count % 10000 == 0:
-                    print(f"  ✓ Processed {row_count} noteevents ({total_inserted} inserted)")
-                batch_docs = []
+                    print(f"  ✓ Processed {row_count} noteevents ({pipeline.inserted} inserted)")
 
-        if batch_docs:
-            mongo_db['noteevents'].insert_many(batch_docs, ordered=False)
-            total_inserted += len(batch_docs)
+            batch = batcher.flush()
+            if batch:
+                pipeline.put(*batch)
+        total_inserted = pipeline.inserted
+        batcher.summary()
 
         print(f"  ✓ Inserted {total_inserted} noteevent documents")
+        telemetry.finish()
         cursor.close()
+        postgres_conn.commit()
         return total_inserted
 
     except Exception as e:
         print(f"✗ Error loading noteevents: {e}")
         cursor.close()
+        postgres_conn.rollback()
         return 0
 
 def create_indexes(mongo_db):
@@ -315,10 +552,31 @@ def log_load_performance(duration_seconds, patients_count, noteevents_count):
         ])
 
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Migrate the PostgreSQL tables into MongoDB documents")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Worker processes building and inserting patient documents, each for its own "
+                             "subject_id range with its own connections (default: %(default)s)")
+    parser.add_argument("--encoders", type=int, default=0,
+                        help="Processes that read, convert and BSON-encode documents, leaving this process "
+                             "only to send them; 0 encodes here (default: %(default)s)")
+    parser.add_argument("--inserters", type=int, default=INSERT_THREADS,
+                        help="Threads running insert_many while documents are built, per process "
+                             "(default: %(default)s)")
+    parser.add_argument("--itersize", type=int, default=CURSOR_ITERSIZE,
+                        help="Rows each server-side cursor fetches per round trip (default: %(default)s)")
+    parser.add_argument("--dates", choices=DATE_MODES, default="string",
+                        help="Store dates and timestamps as ISO strings or as native BSON dates "
+                             "(default: %(default)s)")
+    return parser.parse_args()
+
 def main():
+    args = parse_args()
+
     print("=" * 70)
     print("SOEN363 PHASE 2 - FAST MONGODB LOADING")
     print("Stream from PostgreSQL, batch insert to MongoDB")
+    print(f"Dates stored as: {args.dates}")
     print("=" * 70)
 
     start_time = datetime.now()
@@ -333,10 +591,23 @@ def main():
         print("\n✓ Cleared existing collections")
 
         # Load patients
-        patients_count = load_patients_streaming(postgres_conn, mongo_db)
+        if args.workers > 1:
+            patients_count = load_patients_parallel(postgres_conn, args.workers, args.inserters, args.dates,
+                                                    args.itersize)
+        elif args.encoders > 0:
+            patients_count = load_encoded(postgres_conn, mongo_db, "patients", "patients", "subject_id",
+                                          encode_patient_range, args.encoders, args.inserters, args.dates)
+        else:
+            patients_count = load_patients_streaming(postgres_conn, mongo_db, args.inserters, args.dates,
+                                                     args.itersize)
 
         # Load noteevents
-        noteevents_count = load_noteevents_streaming(postgres_conn, mongo_db)
+        if args.encoders > 0:
+            noteevents_count = load_encoded(postgres_conn, mongo_db, "noteevents", "noteevents", "row_id",
+                                            encode_note_range, args.encoders, args.inserters, args.dates)
+        else:
+            noteevents_count = load_noteevents_streaming(postgres_conn, mongo_db, args.inserters, args.dates,
+                                                         args.itersize)
 
         # Create indexes
         create_indexes(mongo_db)
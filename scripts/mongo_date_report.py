@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+SOEN363 Phase 2 - MongoDB Date Storage Report (ISO strings vs native BSON dates)
+
+This script loads the PostgreSQL tables into MongoDB once per date mode of
+load_to_mongodb_fast.py, each into its own database:
+- string: dates and timestamps stored as ISO strings (the default)
+- native: stored as BSON dates (--dates native)
+and compares, for each mode:
+- storage: BSON data size, average document size, on-disk size and index
+           sizes from collStats, including indexes on the date fields
+- queries: the date range queries of performance_test.py, best of --runs
+The report databases are dropped afterwards unless --keep is given.
+
+USAGE:
+    python scripts/mongo_date_report.py
+    python scripts/mongo_date_report.py --runs 5 --keep
+
+Results are appended to:
+    reports/performance_test_results/performance_test_date_modes.csv
+and the comparison is written to:
+    reports/mongo_date_report.txt
+"""
+
+import argparse
+import csv
+import os
+import time
+from datetime import datetime
+
+from load_to_mongodb_fast import (DATE_MODES, INSERT_THREADS, MONGO_CONFIG, PROJECT_ROOT, connect_mongodb,
+                                  connect_postgres, create_indexes, load_noteevents_streaming,
+                                  load_patients_streaming)
+from performance_test import date_queries, mongo_date_mode
+
+
+# ================================
+# CONFIG
+# ================================
+OUTPUT_CSV = os.path.join(PROJECT_ROOT, "reports", "performance_test_results", "performance_test_date_modes.csv")
+REPORT_TXT = os.path.join(PROJECT_ROOT, "reports", "mongo_date_report.txt")
+
+FIELDNAMES = ["timestamp", "date_mode", "kind", "name", "documents", "size_mb", "avg_document_bytes",
+              "storage_mb", "index_mb", "date_index_mb", "query_ms", "results"]
+
+# Date fields indexed on top of create_indexes(), to compare index key sizes
+DATE_INDEXES = {
+    "patients": ["dob", "admissions.admittime"],
+    "noteevents": ["chartdate"],
+}
+
+report_lines = []
+def report(text=""):
+    print(text)
+    report_lines.append(text + "\n")
+
+def report_database(mode):
+    return f"{MONGO_CONFIG['database']}_dates_{mode}"
+
+def load_mode(postgres_conn, mongo_db, mode, inserters):
+    """Load both collections with dates stored as mode and index them; returns False if a load failed"""
+    mongo_db['patients'].drop()
+    mongo_db['noteevents'].drop()
+    if not load_patients_streaming(postgres_conn, mongo_db, inserters, mode):
+        return False
+    if not load_noteevents_streaming(postgres_conn, mongo_db, inserters, mode):
+        return False
+    create_indexes(mongo_db)
+    for collection, fields in DATE_INDEXES.items():
+        for field in fields:
+            mongo_db[collection].create_index([(field, 1)])
+    print(f"  ✓ Created {sum(len(fields) for fields in DATE_INDEXES.values())} date indexes")
+    return True
+
+def storage_rows(mongo_db, mode):
+    rows = []
+    for collection, fields in DATE_INDEXES.items():
+        stats = mongo_db.command("collStats", collection)
+        index_sizes = stats.get("indexSizes", {})
+        date_index_bytes = sum(index_sizes.get(f"{field}_1", 0) for field in fields)
+        rows.append({
+            "timestamp": datetime.now().isoformat(),
+            "date_mode": mode,
+            "kind": "storage",
+            "name": collection,
+            "documents": stats["count"],
+            "size_mb": round(stats["size"] / 1024 / 1024, 2),
+            "avg_document_bytes": round(stats.get("avgObjSize", 0)),
+            "storage_mb": round(stats["storageSize"] / 1024 / 1024, 2),
+            "index_mb": round(stats["totalIndexSize"] / 1024 / 1024, 2),
+            "date_index_mb": round(date_index_bytes / 1024 / 1024, 2),
+        })
+    return rows
+
+def query_rows(mongo_db, mode, runs):
+    rows = []
+    for name, _, mongo_query in date_queries:
+        best = None
+        for _ in range(runs):
+            start = time.perf_counter()
+            results = mongo_query(mongo_db, mode)
+            seconds = time.perf_counter() - start
+            best = seconds if best is None else min(best, seconds)
+        rows.append({
+            "timestamp": datetime.now().isoformat(),
+            "date_mode": mode,
+            "kind": "query",
+            "name": name,
+            "query_ms": round(best * 1000, 1),
+            "results": len(results),
+        })
+    return rows
+
+def change(before, after):
+    return f"{(after - before) / before:+.0%}" if before else "n/a"
+
+def print_comparison(rows):
+    by_mode = {mode: {row["name"]: row for row in rows if row["date_mode"] == mode} for mode in DATE_MODES}
+    string, native = by_mode["string"], by_mode["native"]
+
+    report("\n" + "=" * 70)
+    report("STORAGE: ISO STRINGS VS NATIVE BSON DATES")
+    report("=" * 70)
+    for collection in DATE_INDEXES:
+        report(f"  {collection}:")
+        for field, label in [("size_mb", "data MB"), ("avg_document_bytes", "avg document bytes"),
+                             ("storage_mb", "on-disk MB"), ("index_mb", "all indexes MB"),
+                             ("date_index_mb", "date indexes MB")]:
+            before, after = string[collection][field], native[collection][field]
+            report(f"    {label:<20} {before:>10} -> {after:>10} ({change(before, after)})")
+
+    report("\n" + "=" * 70)
+    report("DATE QUERIES (best of runs)")
+    report("=" * 70)
+    for name, _, _ in date_queries:
+        before, after = string[name], native[name]
+        report(f"  {name:<44} {before['query_ms']:>8} ms -> {after['query_ms']:>8} ms "
+               f"({change(before['query_ms'], after['query_ms'])})")
+        if before["results"] != after["results"]:
+            report(f"  ⚠ {name}: {before['results']} results with strings, {after['results']} with dates")
+
+# ================================
+# CSV writer
+# ================================
+def write_csv(path, rows):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    file_exists = os.path.isfile(path)
+    with open(path, "a", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
+        if not file_exists:
+            writer.writeheader()
+        writer.writerows(rows)
+    print(f"\n[DONE] Results saved to: {path}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare MongoDB storage and date query times with dates "
+                                                 "stored as ISO strings vs native BSON dates")
+    parser.add_argument("--runs", type=int, default=3, help="Runs per date query; the fastest is kept "
+                                                            "(default: %(default)s)")
+    parser.add_argument("--inserters", type=int, default=INSERT_THREADS,
+                        help="Insert threads used by the loads (default: %(default)s)")
+    parser.add_argument("--keep", action="store_true", help="Keep the report databases instead of dropping them")
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("SOEN363 PHASE 2 - MONGODB DATE STORAGE REPORT")
+    print("=" * 70)
+
+    postgres_conn = connect_postgres()
+    mongo_client, _ = connect_mongodb()
+    rows = []
+    try:
+        for mode in DATE_MODES:
+            mongo_db = mongo_client[report_database(mode)]
+            print(f"\n[LOAD] Dates as {mode} into {mongo_db.name}...")
+            if not load_mode(postgres_conn, mongo_db, mode, args.inserters):
+                print(f"✗ Loading {mongo_db.name} failed")
+                return
+            if mongo_date_mode(mongo_db) != mode:
+                print(f"✗ {mongo_db.name} was not loaded with {mode} dates")
+                return
+            rows.extend(storage_rows(mongo_db, mode))
+            print(f"\n[QUERY] Date queries, best of {max(args.runs, 1)}...")
+            rows.extend(query_rows(mongo_db, mode, max(args.runs, 1)))
+
+        write_csv(OUTPUT_CSV, rows)
+        print_comparison(rows)
+        with open(REPORT_TXT, "w") as f:
+            f.write("".join(report_lines))
+        print(f"\n[DONE] Report saved to: {REPORT_TXT}")
+
+    finally:
+        if not args.keep:
+            for mode in DATE_MODES:
+                mongo_client.drop_database(report_database(mode))
+        postgres_conn.close()
+        mongo_client.close()
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,9 @@ Runs equivalent queries on PostgreSQL and MongoDB and compares:
 - execution time
 - number of records returned
 - correctness (subset matching)
+
+The dates mode times date range queries, with the MongoDB side written for
+dates stored as ISO strings or as BSON dates (load_to_mongodb_fast.py --dates).
 """
 
 import time
@@ -873,6 +876,212 @@ mongo_queries = [
     fetch_q20_mongo
 ]
 
+# date range queries -----------------------------
+# load_to_mongodb_fast.py stores dates as ISO strings by default and as BSON dates
+# with --dates native; the mongo pipelines take the mode the collections were loaded in
+
+def mongo_date_mode(mongo_connection):
+    """Return "native" if the loaded patients store BSON dates, "string" if ISO strings"""
+    patient = mongo_connection["patients"].find_one({"dob": {"$ne": None}}, {"dob": 1})
+    if patient and isinstance(patient["dob"], datetime.datetime):
+        return "native"
+    return "string"
+
+def mongo_date(value, mode):
+    """A date or datetime bound in the form the documents store it"""
+    if mode == "native":
+        if isinstance(value, datetime.datetime):
+            return value
+        return datetime.datetime(value.year, value.month, value.day)
+    return value.isoformat()
+
+def mongo_datetime_field(field, mode):
+    """Expression reading a date field as a date, parsing it in string mode"""
+    if mode == "native":
+        return field
+    return {"$dateFromString": {"dateString": field, "onNull": None}}
+
+def fetch_d1_postgres(postgres_connection):
+    cursor = postgres_connection.cursor()
+    cursor.execute("""
+                    SELECT subject_id, hadm_id, admittime, admission_type
+                    FROM admissions
+                    WHERE admittime >= '2150-01-01' AND admittime < '2160-01-01'
+                    ORDER BY admittime;
+                   """)
+    return cursor.fetchall()
+
+def fetch_d1_mongo(mongo_connection, mode):
+    cursor = mongo_connection["patients"].aggregate([
+        {"$unwind": "$admissions"},
+        {
+            "$match": {
+                "admissions.admittime": {
+                    "$gte": mongo_date(datetime.datetime(2150, 1, 1), mode),
+                    "$lt": mongo_date(datetime.datetime(2160, 1, 1), mode)
+                }
+            }
+        },
+        {
+            "$project": {
+                "_id": 0,
+                "subject_id": "$subject_id",
+                "hadm_id": "$admissions.hadm_id",
+                "admittime": "$admissions.admittime",
+                "admission_type": "$admissions.admission_type"
+            }
+        },
+        {"$sort": {"admittime": 1}}
+    ])
+    return list(cursor)
+
+def fetch_d2_postgres(postgres_connection):
+    cursor = postgres_connection.cursor()
+    cursor.execute("""
+                    SELECT
+                        EXTRACT(YEAR FROM admittime)::int AS admission_year,
+                        COUNT(*) AS admissions
+                    FROM admissions
+                    GROUP BY admission_year
+                    ORDER BY admission_year;
+                   """)
+    return cursor.fetchall()
+
+def fetch_d2_mongo(mongo_connection, mode):
+    if mode == "native":
+        year = {"$year": "$admissions.admittime"}
+    else:
+        year = {"$toInt": {"$substrBytes": ["$admissions.admittime", 0, 4]}}
+    cursor = mongo_connection["patients"].aggregate([
+        {"$unwind": "$admissions"},
+        {
+            "$group": {
+                "_id": year,
+                "admissions": {"$sum": 1}
+            }
+        },
+        {
+            "$project": {
+                "_id": 0,
+                "admission_year": "$_id",
+                "admissions": 1
+            }
+        },
+        {"$sort": {"admission_year": 1}}
+    ])
+    return list(cursor)
+
+def fetch_d3_postgres(postgres_connection):
+    cursor = postgres_connection.cursor()
+    cursor.execute("""
+                    SELECT icustay_id, hadm_id, intime, outtime
+                    FROM icustays
+                    WHERE outtime - intime > INTERVAL '7 days';
+                   """)
+    return cursor.fetchall()
+
+def fetch_d3_mongo(mongo_connection, mode):
+    cursor = mongo_connection["patients"].aggregate([
+        {"$unwind": "$admissions"},
+        {"$unwind": "$admissions.icustays"},
+        {
+            "$match": {
+                "$expr": {
+                    "$gt": [
+                        {
+                            "$subtract": [
+                                mongo_datetime_field("$admissions.icustays.outtime", mode),
+                                mongo_datetime_field("$admissions.icustays.intime", mode)
+                            ]
+                        },
+                        7 * 24 * 3600 * 1000
+                    ]
+                }
+            }
+        },
+        {
+            "$project": {
+                "_id": 0,
+                "icustay_id": "$admissions.icustays.icustay_id",
+                "hadm_id": "$admissions.hadm_id",
+                "intime": "$admissions.icustays.intime",
+                "outtime": "$admissions.icustays.outtime"
+            }
+        }
+    ])
+    return list(cursor)
+
+def fetch_d4_postgres(postgres_connection):
+    cursor = postgres_connection.cursor()
+    cursor.execute("""
+                    SELECT category, COUNT(*) AS note_count
+                    FROM noteevents
+                    WHERE chartdate >= '2150-01-01' AND chartdate < '2160-01-01'
+                    GROUP BY category
+                    ORDER BY note_count DESC;
+                   """)
+    return cursor.fetchall()
+
+def fetch_d4_mongo(mongo_connection, mode):
+    cursor = mongo_connection["noteevents"].aggregate([
+        {
+            "$match": {
+                "chartdate": {
+                    "$gte": mongo_date(datetime.date(2150, 1, 1), mode),
+                    "$lt": mongo_date(datetime.date(2160, 1, 1), mode)
+                }
+            }
+        },
+        {
+            "$group": {
+                "_id": "$category",
+                "note_count": {"$sum": 1}
+            }
+        },
+        {
+            "$project": {
+                "_id": 0,
+                "category": "$_id",
+                "note_count": 1
+            }
+        },
+        {"$sort": {"note_count": -1}}
+    ])
+    return list(cursor)
+
+def fetch_d5_postgres(postgres_connection):
+    cursor = postgres_connection.cursor()
+    cursor.execute("""
+                    SELECT subject_id, gender, dob
+                    FROM patients
+                    WHERE dob < '1900-01-01'
+                    ORDER BY dob;
+                   """)
+    return cursor.fetchall()
+
+def fetch_d5_mongo(mongo_connection, mode):
+    cursor = mongo_connection["patients"].aggregate([
+        {"$match": {"dob": {"$lt": mongo_date(datetime.datetime(1900, 1, 1), mode)}}},
+        {
+            "$project": {
+                "_id": 0,
+                "subject_id": "$subject_id",
+                "gender": "$gender",
+                "dob": "$dob"
+            }
+        },
+        {"$sort": {"dob": 1}}
+    ])
+    return list(cursor)
+
+date_queries = [
+    ("admissions from 2150 to 2159", fetch_d1_postgres, fetch_d1_mongo),
+    ("admissions per year", fetch_d2_postgres, fetch_d2_mongo),
+    ("ICU stays over 7 days", fetch_d3_postgres, fetch_d3_mongo),
+    ("notes charted from 2150 to 2159 by category", fetch_d4_postgres, fetch_d4_mongo),
+    ("patients born before 1900", fetch_d5_postgres, fetch_d5_mongo),
+]
+
 def test_query(index, postgres_connection, mongo_connection):
     log("-"*40)
     log(f"Testing: query {index+1} from part 1")
@@ -894,7 +1103,7 @@ def test_query(index, postgres_connection, mongo_connection):
 
     print("\n")
     percent_diff_in_time = (mongo_time-postgres_time)/postgres_time  
-    log(f"NOSQL is {abs(percent_diff_in_time):.0%} {"faster" if percent_diff_in_time < 0 else "slower"} than SQL")
+    log(f"NOSQL is {abs(percent_diff_in_time):.0%} {'faster' if percent_diff_in_time < 0 else 'slower'} than SQL")
     return (postgres_time, mongo_time, percent_diff_in_time)
 
 
@@ -908,7 +1117,7 @@ def run_query_tests(postgres, mongo):
     log("="*50)
     log("PERFORMANCE TEST COMPLETE RESULTS\n")
     for x in range(20):
-        log(f"Q{x+1}: NOSQL is {abs(all_diff_times[x][2]):.0%} {"faster" if all_diff_times[x][2] < 0 else "slower"} than SQL" )
+        log(f"Q{x+1}: NOSQL is {abs(all_diff_times[x][2]):.0%} {'faster' if all_diff_times[x][2] < 0 else 'slower'} than SQL" )
     log("-"*40)
     log("="*50)
 
@@ -935,6 +1144,48 @@ def run_query_tests(postgres, mongo):
     log("="*50)
     return all_diff_times
 
+def test_date_query(index, postgres_connection, mongo_connection, mode):
+    name, postgres_query, mongo_query = date_queries[index]
+    log("-"*40)
+    log(f"Testing: date query {index+1} ({name})")
+    print("fetching result ...")
+    (postgres_result, postgres_time) = run_and_time(postgres_query, postgres_connection)
+    if isinstance(postgres_result, Exception):
+        log(postgres_result)
+        postgres_result = []
+    log(f"SQL time: {postgres_time:.2f} sec")
+    print("fetching result ...")
+    (mongo_result, mongo_time) = run_and_time(mongo_query, mongo_connection, mode)
+    if isinstance(mongo_result, Exception):
+        log(mongo_result)
+        mongo_result = []
+    log(f"NO SQL time: {mongo_time:.2f} sec")
+
+    if len(mongo_result) != len(postgres_result):
+        log(f"[WARNING] test results differ in length! ({len(postgres_result)} vs {len(mongo_result)})")
+
+    print("\n")
+    percent_diff_in_time = (mongo_time-postgres_time)/postgres_time
+    log(f"NOSQL is {abs(percent_diff_in_time):.0%} {'faster' if percent_diff_in_time < 0 else 'slower'} than SQL")
+    return (postgres_time, mongo_time, percent_diff_in_time)
+
+def run_date_tests(postgres, mongo):
+    mode = mongo_date_mode(mongo)
+    log("="*50)
+    log("comparing retrieval times for date range queries")
+    log(f"MongoDB dates stored as: {mode}\n")
+    all_diff_times = []
+
+    for x in range(len(date_queries)):
+        all_diff_times.append(test_date_query(x, postgres, mongo, mode))
+    log("="*50)
+    log("DATE QUERY TEST COMPLETE RESULTS\n")
+    for x, (name, _, _) in enumerate(date_queries):
+        log(f"D{x+1} ({name}): NOSQL is {abs(all_diff_times[x][2]):.0%} "
+            f"{'faster' if all_diff_times[x][2] < 0 else 'slower'} than SQL")
+    log("="*50)
+    return all_diff_times
+
 def random_datetime(start_year=1920, end_year=2010):
     return datetime.datetime(
         random.randint(start_year, end_year),
@@ -1308,14 +1559,14 @@ def main():
 if __name__ == "__main__":
 
     if len(sys.argv) != 3:
-        print("Usage: python performancetest.py <test_number> <query|insert>")
+        print("Usage: python performancetest.py <test_number> <query|insert|dates>")
         sys.exit(1)
 
     test_number = sys.argv[1]
     mode = sys.argv[2].lower()
 
-    if mode not in ("query", "insert"):
-        print("Mode must be 'query' or 'insert'")
+    if mode not in ("query", "insert", "dates"):
+        print("Mode must be 'query', 'insert' or 'dates'")
         sys.exit(1)
 
     postgres = connect_to_postgres()
@@ -1328,51 +1579,56 @@ if __name__ == "__main__":
         print("Running QUERY performance tests...")
         results = run_query_tests(postgres, mongo)
         outfile = f"reports/performance_test_results/performance_test{test_number}_query.csv"
+    elif mode == "dates":
+        print("Running DATE QUERY performance tests...")
+        results = run_date_tests(postgres, mongo)
+        outfile = f"reports/performance_test_results/performance_test{test_number}_dates.csv"
     else:
         print("Running INSERTION performance tests...")
         results = run_insertion_tests(postgres, mongo)
         outfile = f"reports/performance_test_results/performance_test{test_number}_insert.csv"
 
     postgres.close()
-# -------------------------------
-# EXPORT RESULTS TO CSV
-# -------------------------------
-with open(outfile, "w", newline="") as csvfile:
-    writer = csv.writer(csvfile)
-
-    # Headers
-    if mode == "query":
-        writer.writerow([
-            "Query Number",
-            "Percent Diff SQL→Mongo (mongo - sql) / sql",
-            "Percent Diff Mongo→SQL (sql - mongo) / mongo"
-        ])
-    else:
-        writer.writerow([
-            "Batch Number",
-            "Percent Diff SQL→Mongo (mongo - sql) / sql",
-            "Percent Diff Mongo→SQL (sql - mongo) / mongo"
-        ])
-
-    # Rows
-    for i, (sql_time, mongo_time, diff_time) in enumerate(results):
-
-        if sql_time == 0:
-            pd_sql_to_mongo = float("inf")
-        else:
-            pd_sql_to_mongo = (mongo_time - sql_time) / sql_time
 
-        if mongo_time == 0:
-            pd_mongo_to_sql = float("inf")
+    # -------------------------------
+    # EXPORT RESULTS TO CSV
+    # -------------------------------
+    with open(outfile, "w", newline="") as csvfile:
+        writer = csv.writer(csvfile)
+
+        # Headers
+        if mode in ("query", "dates"):
+            writer.writerow([
+                "Query Number",
+                "Percent Diff SQL→Mongo (mongo - sql) / sql",
+                "Percent Diff Mongo→SQL (sql - mongo) / mongo"
+            ])
         else:
-            pd_mongo_to_sql = (sql_time - mongo_time) / mongo_time
-
-        writer.writerow([
-            i + 1,
-            round(pd_sql_to_mongo * 100, 1),
-            round(pd_mongo_to_sql * 100, 1)
-        ])
-
-    print(f"\nSaved results to {outfile}")
-    with open("reports/performance_report.txt", "w") as f:
-        f.write("".join(report_log))
+            writer.writerow([
+                "Batch Number",
+                "Percent Diff SQL→Mongo (mongo - sql) / sql",
+                "Percent Diff Mongo→SQL (sql - mongo) / mongo"
+            ])
+
+        # Rows
+        for i, (sql_time, mongo_time, diff_time) in enumerate(results):
+
+            if sql_time == 0:
+                pd_sql_to_mongo = float("inf")
+            else:
+                pd_sql_to_mongo = (mongo_time - sql_time) / sql_time
+
+            if mongo_time == 0:
+                pd_mongo_to_sql = float("inf")
+            else:
+                pd_mongo_to_sql = (sql_time - mongo_time) / mongo_time
+
+            writer.writerow([
+                i + 1,
+                round(pd_sql_to_mongo * 100, 1),
+                round(pd_mongo_to_sql * 100, 1)
+            ])
+
+        print(f"\nSaved results to {outfile}")
+        with open("reports/performance_report.txt", "w") as f:
+            f.write("".join(report_log))
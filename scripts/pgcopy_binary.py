@@ -0,0 +1,138 @@
+"""
+SOEN363 Phase 2 - PostgreSQL Binary COPY Encoding
+Encode rows in PGCOPY binary format, typed from the columns in 01-schema.sql
+"""
+
+import struct
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from hospital_schema import TABLE_COLUMNS
+
+# Signature, flags field and header extension length
+PGCOPY_HEADER = b'PGCOPY\n\xff\r\n\x00' + struct.pack('>ii', 0, 0)
+PGCOPY_TRAILER = struct.pack('>h', -1)
+
+NULL_FIELD = struct.pack('>i', -1)
+
+# PostgreSQL stores dates and timestamps relative to 2000-01-01
+PG_EPOCH_DATE = date(2000, 1, 1)
+PG_EPOCH = datetime(2000, 1, 1)
+ONE_MICROSECOND = timedelta(microseconds=1)
+
+NUMERIC_POS = 0x0000
+NUMERIC_NEG = 0x4000
+
+int4 = struct.Struct('>ii')
+int8 = struct.Struct('>iq')
+field_count = struct.Struct('>h')
+field_length = struct.Struct('>i')
+
+def encode_integer(value):
+    return int4.pack(4, int(value))
+
+def encode_timestamp(value):
+    if not isinstance(value, datetime):
+        value = datetime.fromisoformat(str(value))
+    # TIMESTAMP columns ignore any offset, like the text input does
+    value = value.replace(tzinfo=None)
+    return int8.pack(8, (value - PG_EPOCH) // ONE_MICROSECOND)
+
+def encode_date(value):
+    if isinstance(value, datetime):
+        value = value.date()
+    elif not isinstance(value, date):
+        value = date.fromisoformat(str(value)[:10])
+    return int4.pack(4, (value - PG_EPOCH_DATE).days)
+
+def encode_text(value):
+    data = str(value).encode('utf-8')
+    return struct.pack('>i', len(data)) + data
+
+def encode_numeric(value):
+    """Encode a number as base-10000 digit groups around the decimal point"""
+    sign, digits, exponent = Decimal(str(value)).as_tuple()
+    if not isinstance(exponent, int):
+        raise ValueError(f"Cannot encode {value!r} as NUMERIC")
+
+    digit_str = ''.join(map(str, digits))
+    if exponent >= 0:
+        int_part, frac_part = digit_str + '0' * exponent, ''
+    else:
+        digit_str = digit_str.rjust(-exponent, '0')
+        int_part, frac_part = digit_str[:exponent], digit_str[exponent:]
+
+    int_part = int_part.rjust((len(int_part) + 3) // 4 * 4, '0')
+    frac_part = frac_part.ljust((len(frac_part) + 3) // 4 * 4, '0')
+    groups = [int(int_part[i:i + 4]) for i in range(0, len(int_part), 4)]
+    weight = len(groups) - 1
+    groups += [int(frac_part[i:i + 4]) for i in range(0, len(frac_part), 4)]
+
+    # Leading and trailing zero groups are implied by weight and dscale
+    while groups and groups[0] == 0:
+        groups.pop(0)
+        weight -= 1
+    while groups and groups[-1] == 0:
+        groups.pop()
+    if not groups:
+        weight = 0
+
+    dscale = max(0, -exponent)
+    body = struct.pack(f'>hhHh{len(groups)}h', len(groups), weight,
+                       NUMERIC_NEG if sign else NUMERIC_POS, dscale, *groups)
+    return struct.pack('>i', len(body)) + body
+
+def encoder_for_type(column_type):
+    """Return the field encoder for a column type from 01-schema.sql"""
+    if column_type == "INTEGER":
+        return encode_integer
+    if column_type == "TIMESTAMP":
+        return encode_timestamp
+    if column_type == "DATE":
+        return encode_date
+    if column_type.startswith(("VARCHAR", "TEXT")):
+        return encode_text
+    if column_type.startswith("NUMERIC"):
+        return encode_numeric
+    raise ValueError(f"No binary COPY encoder for column type {column_type}")
+
+# Field encoders per table, in column order
+ROW_ENCODERS = {
+    table: [encoder_for_type(column_type) for _, column_type in columns]
+    for table, columns in TABLE_COLUMNS.items()
+}
+
+def encode_row(table, row):
+    """Encode a row as one PGCOPY binary tuple"""
+    fields = [struct.pack('>h', len(row))]
+    for encode, value in zip(ROW_ENCODERS[table], row):
+        fields.append(NULL_FIELD if value is None else encode(value))
+    return b''.join(fields)
+
+def tuple_ranges(buf, target_size):
+    """Split the tuples of a PGCOPY payload into (start, end) byte ranges of about target_size
+
+    buf may hold a whole payload or one shard part of it; the header and
+    trailer are skipped when present, so each range holds whole tuples only.
+    """
+    pos = 0
+    if buf[:11] == PGCOPY_HEADER[:11]:
+        (extension_length,) = field_length.unpack_from(buf, 15)
+        pos = 19 + extension_length
+
+    ranges = []
+    start = pos
+    while pos < len(buf):
+        (count,) = field_count.unpack_from(buf, pos)
+        if count == -1:
+            break
+        pos += 2
+        for _ in range(count):
+            (length,) = field_length.unpack_from(buf, pos)
+            pos += 4 + max(length, 0)
+        if pos - start >= target_size:
+            ranges.append((start, pos))
+            start = pos
+    if pos > start:
+        ranges.append((start, pos))
+    return ranges
@@ -0,0 +1,189 @@
+"""
+SOEN363 Phase 2 - Streaming SQL Statement Splitter
+Split a SQL script into statements while reading it in chunks, so the large
+INSERT scripts can be executed without holding the whole file in memory
+
+A ';' only ends a statement outside of quoted text. Single-quoted strings
+(with '' escapes, and backslash escapes in E'...' strings), double-quoted
+identifiers, -- and /* */ comments and $tag$ dollar quotes are skipped over,
+so semicolons and newlines inside note text reach the server untouched.
+"""
+
+import re
+
+# Characters read from the script per chunk
+READ_SIZE = 1024 * 1024
+
+# Characters that may start a quote or comment, or end a statement
+SPECIAL_RE = re.compile(r"[;'\"$/-]")
+
+# Fast path: a run of plain text and ordinary quoted strings, stopping at ';',
+# comments, dollar quotes and E'' strings, which the token loop handles
+PLAIN_RUN_RE = re.compile(r"""(?:[^;'"$/-]++|(?<![Ee])'(?:[^']++|'')*+'(?!')|"(?:[^"]++|"")*+"(?!")|-(?!-)|/(?!\*))*+""")
+
+QUOTED_RE = {
+    "'": re.compile(r"'(?:[^']++|'')*+'"),
+    "E'": re.compile(r"'(?:[^'\\]++|\\.|'')*+'", re.DOTALL),
+    '"': re.compile(r'"(?:[^"]++|"")*+"'),
+}
+BLOCK_COMMENT_RE = re.compile(r"/\*|\*/")
+DOLLAR_TAG_RE = re.compile(r"\$(?:[A-Za-z_\u0080-\uffff][\w\u0080-\uffff]*)?\$")
+PARTIAL_DOLLAR_TAG_RE = re.compile(r"\$[\w\u0080-\uffff]*")
+IDENTIFIER_CHAR_RE = re.compile(r"[\w$\u0080-\uffff]")
+
+# A multi-row INSERT as written by json_to_sql_converter.py: prefix, then (...) tuples
+INSERT_VALUES_RE = re.compile(r"\s*(INSERT\s+INTO\s+[\w.\"]+\s*(?:\([^()]*\))?\s*VALUES)\s*", re.IGNORECASE)
+VALUE_TUPLE_RE = re.compile(r"\((?:[^'()]++|'(?:[^']++|'')*+'|\((?:[^'()]++|'(?:[^']++|'')*+')*+\))*+\)")
+TUPLE_SEPARATOR_RE = re.compile(r"\s*,\s*")
+STATEMENT_END_RE = re.compile(r"\s*;?\s*\Z")
+
+def is_identifier_char(buf, i):
+    """True if buf[i] exists and can be part of an identifier or keyword"""
+    return i >= 0 and IDENTIFIER_CHAR_RE.match(buf, i) is not None
+
+def quoted_end(buf, i, eof):
+    """Return the offset past the quoted string or identifier opening at buf[i]
+
+    Returns None when the buffer ends before the closing quote is certain
+    (a quote at the very end may be the first half of a doubled quote).
+    """
+    quote = buf[i]
+    if quote == "'" and buf[i - 1:i] in ("E", "e") and not is_identifier_char(buf, i - 2):
+        quote = "E'"
+    match = QUOTED_RE[quote].match(buf, i)
+    if match is None or (match.end() == len(buf) and not eof):
+        if eof:
+            raise ValueError("Unterminated quoted string at end of SQL input")
+        return None
+    return match.end()
+
+def block_comment_end(buf, i, eof):
+    """Return the offset past the (possibly nested) /* */ comment at buf[i], or None if incomplete"""
+    depth = 0
+    for token in BLOCK_COMMENT_RE.finditer(buf, i):
+        depth += 1 if token.group() == "/*" else -1
+        if depth == 0:
+            return token.end()
+    if eof:
+        raise ValueError("Unterminated /* comment at end of SQL input")
+    return None
+
+def dollar_quote_end(buf, i, eof):
+    """Return the offset past the $tag$...$tag$ string at buf[i]
+
+    Returns i + 1 if the '$' does not open a dollar quote, or None if the
+    buffer ends before that can be decided.
+    """
+    if is_identifier_char(buf, i - 1):
+        return i + 1
+    tag = DOLLAR_TAG_RE.match(buf, i)
+    if tag is None:
+        partial = PARTIAL_DOLLAR_TAG_RE.match(buf, i)
+        if partial.end() == len(buf) and not eof:
+            return None
+        return i + 1
+    close = buf.find(tag.group(), tag.end())
+    if close < 0:
+        if eof:
+            raise ValueError("Unterminated dollar-quoted string at end of SQL input")
+        return None
+    return close + len(tag.group())
+
+def iter_sql_statements(f, read_size=READ_SIZE):
+    """Yield each statement of a SQL script read from a text file object
+
+    Statements keep their trailing ';' and all text inside them, including
+    comments and newlines. Empty statements and comment-only text are
+    dropped; a final statement without ';' is still yielded.
+    """
+    buf = ''
+    start = 0
+    pos = 0
+    eof = False
+    has_content = False
+
+    while True:
+        run = PLAIN_RUN_RE.match(buf, pos)
+        # A run reaching the end of the buffer may continue in the next chunk
+        if run.end() > pos and (run.end() < len(buf) or eof):
+            if not has_content and not buf[pos:run.end()].isspace():
+                has_content = True
+            pos = run.end()
+
+        match = SPECIAL_RE.search(buf, pos)
+        i = match.start() if match else len(buf)
+        if not has_content and buf[pos:i].strip():
+            has_content = True
+
+        end = None
+        if match is None:
+            pos = len(buf)
+        elif buf[i] == ';':
+            if has_content:
+                yield buf[start:i + 1].strip()
+            start = pos = i + 1
+            has_content = False
+            continue
+        elif buf[i] in "'\"":
+            end = quoted_end(buf, i, eof)
+            has_content = True
+        elif buf[i] == '$':
+            end = dollar_quote_end(buf, i, eof)
+            has_content = True
+        elif i + 1 == len(buf) and not eof:
+            # A lone '-' or '/' may start a comment continued in the next chunk
+            pass
+        elif buf.startswith('--', i):
+            newline = buf.find('\n', i)
+            if newline >= 0 or eof:
+                end = newline + 1 if newline >= 0 else len(buf)
+        elif buf.startswith('/*', i):
+            end = block_comment_end(buf, i, eof)
+        else:
+            end = i + 1
+            has_content = True
+
+        if end is not None:
+            pos = end
+            continue
+
+        # The buffer ends inside a token: read on, dropping the statements already yielded
+        if eof:
+            break
+        if match is not None:
+            pos = i
+        chunk = f.read(read_size)
+        if not chunk:
+            eof = True
+        buf = buf[start:] + chunk
+        pos -= start
+        start = 0
+
+    if has_content:
+        yield buf[start:].strip()
+
+def split_insert_rows(statement):
+    """Split an INSERT ... VALUES (...), (...) statement into one statement per row
+
+    Returns None for other statements and for VALUES lists this simple
+    scanner can't match (expressions nested more than one level). Backslash
+    escapes in E'' strings are not understood.
+    """
+    prefix = INSERT_VALUES_RE.match(statement)
+    if prefix is None:
+        return None
+
+    rows = []
+    pos = prefix.end()
+    while True:
+        row = VALUE_TUPLE_RE.match(statement, pos)
+        if row is None:
+            return None
+        rows.append(f"{prefix.group(1)} {row.group()};")
+        separator = TUPLE_SEPARATOR_RE.match(statement, row.end())
+        if separator is None:
+            break
+        pos = separator.end()
+    if STATEMENT_END_RE.match(statement, row.end()) is None:
+        return None
+    return rows
@@ -0,0 +1,88 @@
+"""
+SOEN363 Phase 2 - UNLOGGED Staging Tables
+Load into UNLOGGED copies of the generated tables, then swap their contents
+into the real tables in one transaction
+
+The staging tables live in their own schema and have the same names and
+columns as the real tables, but no keys, indexes or foreign keys, and they
+skip the WAL. A loader connection with search_path set to the staging schema
+runs the usual INSERT scripts and COPY statements against them unchanged.
+The merge then truncates the real tables and refills them with set-based
+INSERT ... SELECT, so readers see either the old rows or the new ones, never
+a half-loaded database. Inside that transaction the foreign keys are dropped
+and re-added, so they are checked with one join per constraint instead of a
+trigger call per row.
+"""
+
+import time
+
+from bulk_load import read_schema_objects
+from hospital_schema import column_names
+
+STAGING_SCHEMA = "staging"
+
+def staging_config(config):
+    """Return connection settings whose unqualified table names resolve to the staging tables"""
+    return dict(config, options=f"-c search_path={STAGING_SCHEMA}")
+
+def staging_tables_exist(conn, tables):
+    """True if every staging table is already there (left by an interrupted run)"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT count(*) FROM pg_tables WHERE schemaname = %s AND tablename = ANY(%s)",
+                   (STAGING_SCHEMA, tables))
+    count = cursor.fetchone()[0]
+    conn.commit()
+    cursor.close()
+    return count == len(tables)
+
+def create_staging_tables(conn, tables):
+    """(Re)create empty UNLOGGED staging copies of tables, without keys or indexes"""
+    cursor = conn.cursor()
+    cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {STAGING_SCHEMA}")
+    for table in tables:
+        cursor.execute(f"DROP TABLE IF EXISTS {STAGING_SCHEMA}.{table}")
+        cursor.execute(f"CREATE UNLOGGED TABLE {STAGING_SCHEMA}.{table} (LIKE public.{table} INCLUDING DEFAULTS)")
+    conn.commit()
+    cursor.close()
+    print(f"✓ Created {len(tables)} UNLOGGED staging table(s) in schema {STAGING_SCHEMA}")
+
+def merge_staging_tables(conn, tables):
+    """Replace the contents of the real tables with the staging rows in one transaction
+
+    tables must be in foreign key order. Returns {table: rows merged}.
+    """
+    foreign_keys = [c for c in read_schema_objects(conn, tables)["constraints"] if c["type"] == "f"]
+    cursor = conn.cursor()
+    counts = {}
+    try:
+        for constraint in foreign_keys:
+            cursor.execute(f'ALTER TABLE {constraint["table"]} DROP CONSTRAINT {constraint["name"]}')
+        cursor.execute(f"TRUNCATE {', '.join(f'public.{table}' for table in tables)}")
+        for table in tables:
+            columns = ', '.join(column_names(table))
+            start = time.perf_counter()
+            cursor.execute(f"INSERT INTO public.{table} ({columns}) "
+                           f"SELECT {columns} FROM {STAGING_SCHEMA}.{table}")
+            counts[table] = cursor.rowcount
+            print(f"  ✓ Merged {cursor.rowcount:,} rows into {table} ({time.perf_counter() - start:.2f} seconds)")
+
+        start = time.perf_counter()
+        for constraint in foreign_keys:
+            cursor.execute(f'ALTER TABLE {constraint["table"]} ADD CONSTRAINT {constraint["name"]} '
+                           f'{constraint["definition"]}')
+        print(f"  ✓ Checked {len(foreign_keys)} foreign key(s) ({time.perf_counter() - start:.2f} seconds)")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    return counts
+
+def drop_staging_tables(conn, tables):
+    """Drop the staging tables once their rows are merged"""
+    cursor = conn.cursor()
+    for table in tables:
+        cursor.execute(f"DROP TABLE IF EXISTS {STAGING_SCHEMA}.{table}")
+    conn.commit()
+    cursor.close()